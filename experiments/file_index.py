@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+File helpers for the experiment scripts
+- load_md_index: cached index of the markdown files under a data directory.
+  The first run globs the tree; later runs reload the path list from
+  ~/.koi-cache as long as no directory in the tree has a newer mtime
+- read_head: read only the prefix of a document that a prompt will use
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List
+
+from llm_cache import CACHE_DIR, atomic_write_text
+
+
+def load_md_index(root: Path, exclude_twitter: bool = True, refresh: bool = False) -> List[Path]:
+    """Return the (non-Twitter) *.md files under root, using the cached list when valid
+
+    Adding or removing a file bumps its parent directory's mtime, so the newest
+    directory mtime in the tree validates the cache without stat-ing every file.
+    Pass refresh=True (--refresh-index in the scripts) to rebuild regardless.
+    """
+    root = Path(root)
+    mtime = _tree_mtime(root)
+    cache_path = CACHE_DIR / f"md_index_{hashlib.sha256(str(root.resolve()).encode()).hexdigest()[:16]}.json"
+
+    if not refresh and cache_path.exists():
+        try:
+            data = json.loads(cache_path.read_text())
+            if data["mtime"] == mtime and data["exclude_twitter"] == exclude_twitter:
+                return [Path(p) for p in data["paths"]]
+        except (json.JSONDecodeError, KeyError):
+            pass  # Corrupt or old-format cache, rebuild below
+
+    paths = [str(p) for p in root.rglob("*.md")
+             if not (exclude_twitter and "twitter" in str(p).lower())]
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(cache_path, json.dumps({"mtime": mtime, "exclude_twitter": exclude_twitter, "paths": paths}))
+    return [Path(p) for p in paths]
+
+
+def _tree_mtime(root: Path) -> float:
+    """Newest mtime of root and every directory below it"""
+    newest = root.stat().st_mtime
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    newest = max(newest, entry.stat(follow_symlinks=False).st_mtime)
+                    stack.append(entry.path)
+    return newest
+
+
+def read_head(path: Path, max_chars: int) -> str:
+    """Return the first max_chars characters of a UTF-8 file without reading the rest"""
+    # Text mode keeps read_text()'s newline translation, so CRLF files match it
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        return f.read(max_chars)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Linear-time extraction of the JSON value embedded in an LLM response
+Tracks bracket depth while skipping string literals, so it never backtracks
+the way a greedy `[\\s\\S]*` regex does on nested or truncated output.
+Bracketed prose such as "[see note]" closes but does not parse, so it is
+skipped and scanning resumes at the next opener.
+"""
+
+import json
+from typing import Optional
+
+OPENERS = "[{"
+CLOSERS = "]}"
+
+
+class BracketScanner:
+    """Incremental bracket-depth tracker that ignores brackets inside JSON strings
+
+    Text can be fed in pieces (e.g. streamed response chunks); scanning starts at
+    the first `[` or `{` and stops once that value's closing bracket is seen.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.closed = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> int:
+        """Scan more text; return the index in `text` just past the closing bracket, or -1"""
+        if self.closed:
+            return -1
+        for i, ch in enumerate(text):
+            if not self.started:
+                if ch in OPENERS:
+                    self.started = True
+                    self.depth = 1
+                continue
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in OPENERS:
+                self.depth += 1
+            elif ch in CLOSERS:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.closed = True
+                    return i + 1
+        return -1
+
+
+class JsonFinder:
+    """Find the first bracketed span that parses as JSON in incrementally fed text"""
+
+    def __init__(self):
+        self.text = ""
+        self.value: Optional[str] = None
+        self.start: Optional[int] = None  # Opener of the span being scanned
+        self._pos = 0  # Everything before this has been scanned
+        self._scanner = BracketScanner()
+
+    def feed(self, chunk: str) -> bool:
+        """Append text; return True once a complete, parseable value has been seen"""
+        if self.value is not None:
+            return True
+        self.text += chunk
+        while self._pos < len(self.text):
+            if self.start is None:
+                self.start = _first_opener(self.text, self._pos)
+                if self.start is None:
+                    self._pos = len(self.text)
+                    return False
+                self._pos = self.start
+                self._scanner = BracketScanner()
+            end = self._scanner.feed(self.text[self._pos:])
+            if end == -1:
+                self._pos = len(self.text)
+                return False
+            candidate = self.text[self.start:self._pos + end]
+            try:
+                json.loads(candidate)
+            except ValueError:
+                # Closed but not JSON; retry from the next opener inside it
+                self._pos = self.start + 1
+                self.start = None
+                continue
+            self.value = candidate
+            return True
+        return False
+
+
+def extract_json(text: str) -> str:
+    """Return the first complete JSON array/object in text
+
+    If no value parses, everything from the first opener that never closes
+    (truncated output) is returned; text without any bracket is returned unchanged.
+    """
+    finder = JsonFinder()
+    if finder.feed(text):
+        return finder.value
+    start = finder.start if finder.start is not None else _first_opener(text)
+    return text if start is None else text[start:]
+
+
+def is_complete_json(text: str) -> bool:
+    """True unless text opens a JSON array/object that never closes (i.e. was truncated)"""
+    finder = JsonFinder()
+    return finder.feed(text) or finder.start is None
+
+
+def _first_opener(text: str, pos: int = 0) -> Optional[int]:
+    positions = [i for i in (text.find("[", pos), text.find("{", pos)) if i != -1]
+    return min(positions) if positions else None
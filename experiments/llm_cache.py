@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Disk-backed cache for Ollama generate responses
+Responses are keyed by SHA-256 of (model, prompt, options, format) and stored
+as JSON files under ~/.koi-cache so repeated runs skip inference entirely.
+An optional semantic tier returns the response of a previously seen prompt
+whose embedding is close enough to the new one.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+CACHE_DIR = Path(os.environ.get("KOI_CACHE_DIR", "~/.koi-cache")).expanduser()
+
+# Only near-deterministic generations are worth replaying from cache
+MAX_CACHEABLE_TEMPERATURE = 0.3
+OLLAMA_DEFAULT_TEMPERATURE = 0.8
+
+# Semantic tier: prompt embeddings (float32 rows) plus the cache key each row points to
+EMBED_MODEL = "nomic-embed-text"
+SEMANTIC_THRESHOLD = 0.95
+SEMANTIC_EMBEDDINGS = CACHE_DIR / "semantic_index.npy"
+SEMANTIC_ENTRIES = CACHE_DIR / "semantic_index.json"
+
+_semantic_embeddings = None  # np.ndarray, loaded lazily
+_semantic_entries: List[Dict] = []
+
+
+def cache_key(model: str, prompt: str, options: Optional[Dict] = None, format: Optional[str] = None) -> str:
+    """Hash the request parameters that determine the response"""
+    payload = json.dumps({"m": model, "p": prompt, "o": options or {}, "f": format}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get(key: str) -> Optional[Dict]:
+    """Return the cached response for a key, or None on a miss"""
+    path = CACHE_DIR / f"{key}.json"
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def put(key: str, value: Dict) -> None:
+    """Store a response atomically so a crash never leaves a partial entry"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(CACHE_DIR / f"{key}.json", json.dumps(value, default=str))
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write via a temp file and os.replace; the temp file is removed if anything fails"""
+    _atomic_write(path, "w", lambda f: f.write(text))
+
+
+def _atomic_write(path: Path, mode: str, write) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def _load_semantic_index():
+    """Load the embedding matrix and its entries once per process"""
+    global _semantic_embeddings, _semantic_entries
+    import numpy as np
+
+    if _semantic_embeddings is None:
+        if SEMANTIC_EMBEDDINGS.exists() and SEMANTIC_ENTRIES.exists():
+            _semantic_embeddings = np.load(SEMANTIC_EMBEDDINGS)
+            _semantic_entries = json.loads(SEMANTIC_ENTRIES.read_text())
+        else:
+            _semantic_embeddings = np.empty((0, 0), dtype=np.float32)
+            _semantic_entries = []
+    return _semantic_embeddings, _semantic_entries
+
+
+def _normalize(embedding: List[float]):
+    import numpy as np
+
+    vec = np.asarray(embedding, dtype=np.float32)
+    return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+
+def semantic_lookup(embedding: List[float], model: str, temperature: float) -> Optional[str]:
+    """Return the cache key of the most similar stored prompt for the same model and temperature"""
+    embeddings, entries = _load_semantic_index()
+    if not entries:
+        return None
+
+    # Rows are unit vectors, so one matrix-vector product gives every cosine similarity
+    scores = embeddings @ _normalize(embedding)
+    for idx in scores.argsort()[::-1]:
+        if scores[idx] < SEMANTIC_THRESHOLD:
+            break
+        entry = entries[idx]
+        if entry["model"] == model and entry["temperature"] == temperature:
+            return entry["key"]
+    return None
+
+
+def semantic_add(embedding: List[float], key: str, model: str, temperature: float) -> None:
+    """Append a prompt embedding to the index and persist it"""
+    global _semantic_embeddings
+    import numpy as np
+
+    embeddings, entries = _load_semantic_index()
+    row = _normalize(embedding)[np.newaxis, :]
+    _semantic_embeddings = row if embeddings.size == 0 else np.vstack([embeddings, row])
+    entries.append({"key": key, "model": model, "temperature": temperature})
+
+    # Both files are replaced atomically so a crash never leaves a truncated index
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _atomic_write(SEMANTIC_EMBEDDINGS, "wb", lambda f: np.save(f, _semantic_embeddings))
+    atomic_write_text(SEMANTIC_ENTRIES, json.dumps(entries))
+
+
+def _is_cacheable(options: Optional[Dict]) -> bool:
+    return (options or {}).get("temperature", OLLAMA_DEFAULT_TEMPERATURE) <= MAX_CACHEABLE_TEMPERATURE
+
+
+def _should_store(response: Dict) -> bool:
+    # A response cut off by num_predict would be replayed truncated forever
+    return response.get("done_reason") != "length"
+
+
+def response_to_dict(response: Any) -> Dict:
+    # ollama>=0.4 returns pydantic models, older versions plain dicts
+    return response.model_dump() if hasattr(response, "model_dump") else dict(response)
+
+
+def cached_generate(client, model: str, prompt: str, options: Optional[Dict] = None, **kwargs) -> Dict:
+    """client.generate with a disk cache in front (blocking ollama.Client)"""
+    if not _is_cacheable(options):
+        return client.generate(model=model, prompt=prompt, options=options, **kwargs)
+
+    key = cache_key(model, prompt, options, kwargs.get("format"))
+    cached = get(key)
+    if cached is not None:
+        return cached
+
+    response = response_to_dict(client.generate(model=model, prompt=prompt, options=options, **kwargs))
+    if _should_store(response):
+        put(key, response)
+    return response
+
+
+async def cached_generate_async(client, model: str, prompt: str, options: Optional[Dict] = None,
+                                semantic: bool = False, **kwargs) -> Dict:
+    """client.generate with a disk cache in front (ollama.AsyncClient)
+
+    With semantic=True an exact miss falls back to the most similar cached prompt,
+    which trades exactness for hits on near-duplicate prompts.
+    """
+    if not _is_cacheable(options):
+        return await client.generate(model=model, prompt=prompt, options=options, **kwargs)
+
+    key = cache_key(model, prompt, options, kwargs.get("format"))
+    cached = get(key)
+    if cached is not None:
+        return cached
+
+    if semantic:
+        temperature = (options or {}).get("temperature", OLLAMA_DEFAULT_TEMPERATURE)
+        embedding = (await client.embeddings(model=EMBED_MODEL, prompt=prompt))["embedding"]
+        similar_key = semantic_lookup(embedding, model, temperature)
+        cached = get(similar_key) if similar_key else None
+        if cached is not None:
+            return {**cached, "semantic_hit": True}
+
+    response = response_to_dict(await client.generate(model=model, prompt=prompt, options=options, **kwargs))
+    if _should_store(response):
+        put(key, response)
+        if semantic:
+            semantic_add(embedding, key, model, temperature)
+    return response
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+JSON generation helpers for the extraction scripts
+- StreamingJsonClient streams a generation and hangs up as soon as the first
+  JSON value closes and parses, so trailing chatter is never decoded
+- generate_json uses an adaptive token budget: short extractions rarely need
+  more than a few hundred tokens, so the first attempt uses a small num_predict
+  and only a truncated response is retried with a larger one
+"""
+
+from typing import Any, Dict, Optional
+
+from json_scan import JsonFinder, is_complete_json
+from llm_cache import cached_generate_async, response_to_dict
+
+DEFAULT_BUDGET = 400
+RETRY_FACTOR = 3
+
+
+class StreamingJsonClient:
+    """Wrap a client so generate() streams and stops at the end of the JSON value"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def generate(self, model: str, prompt: str, options: Optional[Dict] = None, **kwargs) -> Dict:
+        kwargs.pop("stream", None)
+        finder = JsonFinder()
+        last: Any = {}
+        stopped_early = False
+
+        stream = await self.client.generate(model=model, prompt=prompt, options=options, stream=True, **kwargs)
+        try:
+            async for chunk in stream:
+                last = chunk
+                if finder.feed(chunk["response"]):
+                    stopped_early = not chunk.get("done")
+                    break
+        finally:
+            # Closing the stream drops the connection, which makes the server stop generating
+            await stream.aclose()
+
+        response = response_to_dict(last) if last else {}
+        # Keep any prose before the value; the chunk tail after it is dropped
+        response["response"] = finder.text[:finder.start] + finder.value if finder.value else finder.text
+        if stopped_early:
+            response["done_reason"] = "stop"
+            response["early_stop"] = True
+        return response
+
+    async def embeddings(self, **kwargs) -> Any:
+        return await self.client.embeddings(**kwargs)
+
+
+def looks_complete(response: Dict) -> bool:
+    """Whether generation finished on its own with the JSON value closed"""
+    return response.get("done_reason") != "length" and is_complete_json(response["response"])
+
+
+async def generate_json(client, model: str, prompt: str, options: Optional[Dict] = None,
+                        budget: int = DEFAULT_BUDGET, **kwargs) -> Dict:
+    """Generate with num_predict=budget, retrying once with RETRY_FACTOR x budget if cut off"""
+    streaming_client = StreamingJsonClient(client)
+    for num_predict in (budget, budget * RETRY_FACTOR):
+        response = await cached_generate_async(
+            streaming_client,
+            model=model,
+            prompt=prompt,
+            options={**(options or {}), "num_predict": num_predict},
+            **kwargs
+        )
+        if looks_complete(response):
+            break
+    return response
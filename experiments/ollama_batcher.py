@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Coalesce concurrent Ollama generate requests into batches
+Ollama has no multi-prompt endpoint, so a batch is dispatched as concurrent
+requests; with OLLAMA_NUM_PARALLEL > 1 the server decodes them together.
+A lone request is sent immediately; when several arrive together the batch
+waits at most max_wait_ms for more. A batch holds its slots until every
+response is complete, including streamed ones, so at most max_batch requests
+are in flight.
+"""
+
+import asyncio
+from typing import Any, List, Optional, Tuple
+
+
+class Batcher:
+    """Queue generate requests and flush them in batches of up to max_batch"""
+
+    def __init__(self, client=None, max_batch: int = 16, max_wait_ms: int = 50):
+        self._client = client
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def client(self):
+        """The wrapped client, defaulting to the shared ollama_client.CLIENT on first use"""
+        if self._client is None:
+            from ollama_client import CLIENT
+            self._client = CLIENT
+        return self._client
+
+    async def submit(self, prompt: str, **kwargs) -> Any:
+        """Queue one generate request and wait for its response"""
+        if self._flush_task is None or self._flush_task.done():
+            self._queue = asyncio.Queue()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(({"prompt": prompt, **kwargs}, future))
+        return await future
+
+    async def generate(self, prompt: str, **kwargs) -> Any:
+        """Drop-in for client.generate, so the batcher can stand in for a client"""
+        return await self.submit(prompt, **kwargs)
+
+    async def embeddings(self, **kwargs) -> Any:
+        return await self.client.embeddings(**kwargs)
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            # Let callers submitting in the same tick (e.g. a gather) enqueue first
+            await asyncio.sleep(0)
+            self._drain(batch)
+            deadline = loop.time() + self.max_wait
+            while 1 < len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Requests arriving meanwhile queue up for the next batch
+            await self._run_batch(batch)
+
+    def _drain(self, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run_batch(self, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        await asyncio.gather(*(self._dispatch(kwargs, future) for kwargs, future in batch))
+
+    async def _dispatch(self, kwargs: dict, future: asyncio.Future) -> None:
+        """Send one request and resolve its future; never raises, so the flush loop survives"""
+        try:
+            response = await self.client.generate(**kwargs)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        if not kwargs.get("stream"):
+            if not future.done():  # Caller may have been cancelled while waiting
+                future.set_result(response)
+            return
+
+        # A stream is only done once the caller exhausts or closes it
+        released = asyncio.Event()
+        if future.done():
+            await response.aclose()
+            return
+        future.set_result(_SlotStream(response, released))
+        await released.wait()
+
+
+class _SlotStream:
+    """Streamed response that frees its batch slot when exhausted or closed"""
+
+    def __init__(self, stream, released: asyncio.Event):
+        self._stream = stream
+        self._released = released
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            return await self._stream.__anext__()
+        except BaseException:
+            self._released.set()
+            raise
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._released.set()
+
+
+# One batcher per process, shared by every caller
+BATCHER = Batcher()
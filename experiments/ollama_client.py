@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Shared Ollama client for the experiment scripts
+One AsyncClient per process keeps its httpx connection pool warm, so repeated
+generate calls reuse keep-alive sockets instead of reconnecting each time
+"""
+
+import httpx
+import ollama
+
+OLLAMA_TIMEOUT = 600  # seconds; long generations on CPU can take minutes
+
+CLIENT = ollama.AsyncClient(
+    timeout=httpx.Timeout(OLLAMA_TIMEOUT),
+    limits=httpx.Limits(max_keepalive_connections=8, max_connections=8)
+)
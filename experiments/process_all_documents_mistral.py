@@ -15,6 +15,8 @@ from dataclasses import dataclass
 import ollama
 import time
 
+from llm_cache import cached_generate
+
 @dataclass
 class ProcessingStats:
     """Track processing statistics"""
@@ -29,8 +31,10 @@ class ProcessingStats:
 class ProductionMetabolicProcessor:
     """Production processor with Mistral 7B"""
     
-    def __init__(self, model: str = "mistral:7b"):
+    def __init__(self, model: str = "mistral:7b", use_cache: bool = False):
         self.model = model
+        # Response caching is for iterating on test scripts; full runs write no cache entries
+        self.use_cache = use_cache
         self.stats = ProcessingStats()
         self.processed_entities = []
         self.client = ollama.Client()
@@ -53,8 +57,13 @@ class ProductionMetabolicProcessor:
         hash_obj = hashlib.sha256(content.encode())
         return f"cid:sha256:{hash_obj.hexdigest()[:16]}"
     
-    async def extract_with_mistral(self, content: str, metadata: Dict) -> List[Dict]:
-        """Extract entities using Mistral 7B"""
+    async def extract_with_mistral(self, content: str, metadata: Dict,
+                                   fallback: bool = True) -> Optional[List[Dict]]:
+        """
+        Extract entities using Mistral 7B
+        When the model fails or returns nothing usable, falls back to extract_basic,
+        or with fallback=False returns None so callers can tell the two apart
+        """
         try:
             # Optimized prompt for Mistral
             prompt = f"""Extract entities from this document using Regen Network ontology.
@@ -86,7 +95,7 @@ Focus on substantive entities, not forcing discourse elements if not present.
 JSON array:"""
 
             # Call Mistral
-            response = self.client.generate(
+            generate_kwargs = dict(
                 model=self.model,
                 prompt=prompt,
                 format="json",
@@ -98,6 +107,12 @@ JSON array:"""
                 },
                 stream=False
             )
+            # ollama.Client blocks, so run it in a worker thread; otherwise concurrent
+            # extract_with_mistral calls would serialize on the event loop
+            if self.use_cache:
+                response = await asyncio.to_thread(cached_generate, self.client, **generate_kwargs)
+            else:
+                response = await asyncio.to_thread(self.client.generate, **generate_kwargs)
             
             # Parse response
             result_text = response['response']
@@ -152,11 +167,13 @@ JSON array:"""
                     
                     valid_entities.append(entity)
             
-            return valid_entities if valid_entities else self.extract_basic(content, metadata)
+            if valid_entities:
+                return valid_entities
             
         except Exception as e:
             print(f"  Mistral extraction failed: {e}")
-            return self.extract_basic(content, metadata)
+        
+        return self.extract_basic(content, metadata) if fallback else None
     
     def extract_basic(self, content: str, metadata: Dict) -> List[Dict]:
         """Basic fallback extraction"""
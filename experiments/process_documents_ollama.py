@@ -8,17 +8,34 @@ import asyncio
 import json
 import hashlib
 import os
+import re
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
+from functools import lru_cache
 import ollama
 from dotenv import load_dotenv
+from json_scan import extract_json, is_complete_json
 
 # Load environment
 load_dotenv('/Users/darrenzal/koi-research/.env')
 
-@dataclass
+# Source keywords in one alternation; the group name is the source label
+_SRC_RE = re.compile(
+    r'(?P<notion>notion)|(?P<discourse>discourse)|(?P<medium>medium)'
+    r'|(?P<podcast>podcast)|(?P<twitter>twitter)|(?P<github>github)',
+    re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=4096)
+def _source_for_directory(directory: str) -> Optional[str]:
+    """Source label for a directory path, shared by every file under it"""
+    match = _SRC_RE.search(directory)
+    return match.lastgroup if match else None
+
+@dataclass(slots=True)
 class ProcessingStats:
     """Track processing statistics"""
     total_documents: int = 0
@@ -26,17 +43,37 @@ class ProcessingStats:
     failed_documents: int = 0
     entities_extracted: int = 0
     processing_time: float = 0.0
+    llm_calls: int = 0
+    llm_retries: int = 0
+    llm_server_time: float = 0.0  # Summed prompt-eval + eval durations, seconds
     
 
 class OllamaMetabolicProcessor:
     """Process documents with metabolic ontology extraction using Ollama"""
     
+    # Generation options never change between calls, so bind them once
+    _GEN_OPTIONS = {
+        "temperature": 0.2,  # Lower for more consistent output
+        "top_p": 0.9,
+        "num_predict": 2000,  # Enough for multiple entities
+        "seed": 42  # For reproducibility
+    }
+    # format="json" constrains the output to a single object, after which the
+    # grammar only allows whitespace; models can pad that out to num_predict.
+    # A run of blank lines never occurs inside the object (newlines in strings
+    # are escaped), so stopping there ends generation without cutting the value.
+    # Most documents fit in a small budget; the full one is only used on retry
+    # and runs without the stop so a retry cannot fail the same way.
+    _FAST_OPTIONS = {**_GEN_OPTIONS, "num_predict": 512, "stop": ["\n\n\n"]}
+    _SLOW_OPTIONS = _GEN_OPTIONS
+    
     def __init__(self, model: str = "deepseek-coder:6.7b", use_llm: bool = True):
         self.model = model
         self.use_llm = use_llm
         self.stats = ProcessingStats()
         self.processed_entities = []
-        self.client = ollama.Client()
+        # Async client so concurrent process_document calls overlap on the server
+        self.client = ollama.AsyncClient()
         
         # Metabolic ontology context
         self.ontology_context = {
@@ -51,6 +88,33 @@ class OllamaMetabolicProcessor:
         # DeepSeek-optimized prompt using the winning strategy
         self.system_prompt = ""
     
+    async def __aenter__(self) -> "OllamaMetabolicProcessor":
+        """Warm up once so every document processed in the block reuses the loaded model"""
+        if self.use_llm:
+            try:
+                await self._warmup()
+            except Exception as e:
+                print(f"⚠️ Ollama warmup failed ({e}); falling back to basic extraction")
+                self.use_llm = False
+                await self._close_client()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self._close_client()
+    
+    async def _close_client(self) -> None:
+        """Close the client's connection pool (safe to call twice)"""
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            await close()
+        else:
+            # Older ollama releases have no public close(); shut down the httpx pool they wrap
+            await self.client._client.aclose()
+    
+    async def _warmup(self) -> None:
+        """Load the model with a 1-token generation and keep it resident"""
+        await self.client.generate(model=self.model, prompt="", options={"num_predict": 1}, keep_alive="30m")
+    
     def generate_rid(self, source: str, identifier: str) -> str:
         """Generate Resource Identifier"""
         return f"orn:regen.{source}:{identifier}"
@@ -91,50 +155,44 @@ Use ONLY these processes: "Anchor", "Attest", "Issue", "Circulate", "Govern", "R
 
 Extract entities now. Return ONLY the JSON array:"""
             
-            # Call Ollama
-            response = self.client.generate(
-                model=self.model,
-                prompt=prompt,
-                format="json",  # Request JSON output
-                options={
-                    "temperature": 0.2,  # Lower for more consistent output
-                    "top_p": 0.9,
-                    "num_predict": 2000,  # Enough for multiple entities
-                    "seed": 42  # For reproducibility
-                }
-            )
+            # Call Ollama with the fast budget, retrying with the full one only when truncated
+            for options in (self._FAST_OPTIONS, self._SLOW_OPTIONS):
+                response = await self.client.generate(
+                    model=self.model,
+                    prompt=prompt,
+                    format="json",  # Request JSON output
+                    options=options
+                )
+                self.stats.llm_calls += 1
+                # total_duration includes time queued for a parallel slot; only count compute
+                self.stats.llm_server_time += ((response.get('prompt_eval_duration') or 0)
+                                               + (response.get('eval_duration') or 0)) / 1e9
+                
+                # Clean up the response if needed
+                result_text = response['response'].strip()
+                
+                truncated = response.get('done_reason') == 'length' or not is_complete_json(result_text)
+                if options is self._SLOW_OPTIONS or not truncated:
+                    break
+                self.stats.llm_retries += 1
             
             # Parse the response
             try:
-                result_text = response['response']
-                # Clean up the response if needed
-                result_text = result_text.strip()
-                if not result_text.startswith('['):
-                    # Try to extract JSON array from the response
-                    import re
-                    json_match = re.search(r'\[.*\]', result_text, re.DOTALL)
-                    if json_match:
-                        result_text = json_match.group()
-                    else:
-                        # Wrap single entity in array
-                        result_text = f"[{result_text}]"
-                
-                entities = json.loads(result_text)
+                entities = json.loads(extract_json(result_text))
                 
-                # Ensure entities is a list
+                # Ensure entities is a list (a single entity comes back as an object)
                 if isinstance(entities, dict):
                     entities = [entities]
                 
-                # Add document metadata to each entity
+                # Add document metadata to each entity (defaults computed once per document)
+                base_rid = self.generate_rid(metadata.get('source', 'document'), metadata.get('id', 'unknown'))
+                found_in = metadata.get('path', '')
+                extracted_at = datetime.now(tz=timezone.utc).isoformat()
                 for i, entity in enumerate(entities):
                     if isinstance(entity, dict):  # Ensure it's a dict
-                        if '@id' not in entity:
-                            entity['@id'] = self.generate_rid(
-                                metadata.get('source', 'document'),
-                                f"{metadata.get('id', 'unknown')}_{i}"
-                            )
-                        entity['foundIn'] = metadata.get('path', '')
-                        entity['extractedAt'] = datetime.now(tz=timezone.utc).isoformat()
+                        entity.setdefault('@id', f"{base_rid}_{i}")
+                        entity['foundIn'] = found_in
+                        entity['extractedAt'] = extracted_at
                 
                 return entities
                 
@@ -194,6 +252,19 @@ Extract entities now. Return ONLY the JSON array:"""
     
     async def process_document(self, file_path: Path) -> Dict:
         """Process a single document"""
+        result = await self._process_document(file_path)
+        self._record_results([result])
+        return result
+    
+    def _record_results(self, results: List[Optional[Dict]]) -> None:
+        """Fold a batch of document results into the stats in one update"""
+        processed = [r for r in results if r]
+        self.stats.processed_documents += len(processed)
+        self.stats.failed_documents += len(results) - len(processed)
+        self.stats.entities_extracted += sum(len(r["entities"]) for r in processed)
+    
+    async def _process_document(self, file_path: Path) -> Optional[Dict]:
+        """Process a single document without touching the shared stats"""
         import time
         start_time = time.time()
         
@@ -216,9 +287,6 @@ Extract entities now. Return ONLY the JSON array:"""
             else:
                 entities = self.extract_entities_basic(content, metadata)
             
-            self.stats.entities_extracted += len(entities)
-            self.stats.processed_documents += 1
-            
             # Track metabolic transformation
             transformation = {
                 "@type": "regen:Transformation",
@@ -238,26 +306,15 @@ Extract entities now. Return ONLY the JSON array:"""
             
         except Exception as e:
             print(f"Error processing {file_path}: {e}")
-            self.stats.failed_documents += 1
             return None
     
     def _identify_source(self, file_path: Path) -> str:
-        """Identify source from file path"""
-        path_str = str(file_path).lower()
-        if "notion" in path_str:
-            return "notion"
-        elif "discourse" in path_str:
-            return "discourse"
-        elif "medium" in path_str:
-            return "medium"
-        elif "podcast" in path_str:
-            return "podcast"
-        elif "twitter" in path_str:
-            return "twitter"
-        elif "github" in path_str:
-            return "github"
-        else:
-            return "document"
+        """Identify source from file path (first source keyword in the path wins)"""
+        source = _source_for_directory(str(file_path.parent))
+        if source is None:
+            match = _SRC_RE.search(file_path.name)
+            source = match.lastgroup if match else "document"
+        return source
     
     async def process_directory(self, directory: Path, limit: Optional[int] = None, exclude_twitter: bool = True) -> None:
         """Process documents in a directory"""
@@ -288,13 +345,12 @@ Extract entities now. Return ONLY the JSON array:"""
         batch_size = 5
         for i in range(0, len(files), batch_size):
             batch = files[i:i+batch_size]
-            tasks = [self.process_document(f) for f in batch]
+            tasks = [self._process_document(f) for f in batch]
             results = await asyncio.gather(*tasks)
             
-            # Store results
-            for result in results:
-                if result:
-                    self.processed_entities.append(result)
+            # Store results and flush counters once per batch
+            self._record_results(results)
+            self.processed_entities.extend(result for result in results if result)
             
             # Progress update
             print(f"Progress: {self.stats.processed_documents}/{self.stats.total_documents} "
@@ -313,6 +369,7 @@ Extract entities now. Return ONLY the JSON array:"""
                 "failed_documents": self.stats.failed_documents,
                 "entities_extracted": self.stats.entities_extracted,
                 "processing_time": self.stats.processing_time,
+                "llm_retry_rate": self.stats.llm_retries / max(self.stats.llm_calls - self.stats.llm_retries, 1),
                 "avg_time_per_doc": self.stats.processing_time / max(self.stats.processed_documents, 1)
             },
             "entities": self.processed_entities
@@ -332,6 +389,10 @@ Extract entities now. Return ONLY the JSON array:"""
         print(f"Documents processed: {self.stats.processed_documents}/{self.stats.total_documents}")
         print(f"Documents failed: {self.stats.failed_documents}")
         print(f"Entities extracted: {self.stats.entities_extracted}")
+        if self.stats.llm_calls:
+            first_pass = max(self.stats.llm_calls - self.stats.llm_retries, 1)
+            print(f"LLM retries (num_predict {self._FAST_OPTIONS['num_predict']} -> {self._SLOW_OPTIONS['num_predict']}): "
+                  f"{self.stats.llm_retries}/{first_pass} ({self.stats.llm_retries / first_pass:.0%})")
         print(f"Total time: {self.stats.processing_time:.2f} seconds")
         print(f"Avg time per doc: {self.stats.processing_time / max(self.stats.processed_documents, 1):.2f} seconds")
         
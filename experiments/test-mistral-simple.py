@@ -3,16 +3,21 @@
 Simple test of Mistral for discourse extraction
 """
 
-import ollama
+import asyncio
 import json
+from collections import Counter
 from pathlib import Path
 
-def test_mistral_on_scientific_paper():
+from file_index import read_head
+from llm_extract import generate_json
+from ollama_batcher import BATCHER
+
+async def test_mistral_on_scientific_paper():
     """Test Mistral on the scientific paper"""
     
     # Read the scientific paper
     doc_path = Path("/Users/darrenzal/koi-research/test-documents/scientific-paper.md")
-    content = doc_path.read_text()[:1500]  # First 1500 chars
+    content = read_head(doc_path, 1500)  # First 1500 chars
     
     print("📄 Testing Mistral on scientific paper")
     print("=" * 60)
@@ -40,14 +45,14 @@ JSON output:"""
     print("🤖 Calling Mistral 7B...")
     
     # Call Mistral
-    client = ollama.Client()
-    response = client.generate(
+    # Small token budget first; retried with a larger one only if the JSON is cut off
+    response = await generate_json(
+        BATCHER,
         model="mistral:7b",
         prompt=prompt,
         format="json",
         options={
-            "temperature": 0.3,
-            "num_predict": 2000
+            "temperature": 0.3
         },
         stream=False
     )
@@ -78,10 +83,7 @@ JSON output:"""
                     print(f"  Relationship: {entity.get('relationship')}")
         
         # Count types
-        type_counts = {}
-        for e in (entities if isinstance(entities, list) else [entities]):
-            etype = e.get('type', 'Unknown')
-            type_counts[etype] = type_counts.get(etype, 0) + 1
+        type_counts = Counter(e.get('type', 'Unknown') for e in (entities if isinstance(entities, list) else [entities]))
         
         print("\n📈 Summary:")
         for dtype, count in type_counts.items():
@@ -96,4 +98,4 @@ JSON output:"""
         print(f"\n❌ Error: {e}")
 
 if __name__ == "__main__":
-    test_mistral_on_scientific_paper()
\ No newline at end of file
+    asyncio.run(test_mistral_on_scientific_paper())
\ No newline at end of file
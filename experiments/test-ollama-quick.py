@@ -1,60 +1,90 @@
 #!/usr/bin/env python3
 """
 Quick test of Ollama/DeepSeek Coder extraction
+
+Concurrency only helps if the Ollama *server* runs parallel slots; setting the
+variables in this process does nothing. On a systemd install:
+    sudo systemctl edit ollama
+    [Service]
+    Environment="OLLAMA_NUM_PARALLEL=4"
+    Environment="OLLAMA_MAX_LOADED_MODELS=1"
+    Environment="OLLAMA_KEEP_ALIVE=10m"
+Export the same OLLAMA_NUM_PARALLEL here so the client matches the server.
 """
 
 import asyncio
 import json
+import os
+import time
 from pathlib import Path
 import sys
 sys.path.append('/Users/darrenzal/koi-research')
 from process_documents_ollama import OllamaMetabolicProcessor
+from file_index import load_md_index
+
+# Match the server's parallel slots; more in-flight requests would just queue
+MAX_CONCURRENCY = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+
+# Rebuild the cached file index instead of trusting it
+REFRESH_INDEX = "--refresh-index" in sys.argv
 
 async def quick_test():
     """Test with just 5 documents"""
     print("🧪 Quick test with 5 documents")
     print("=" * 60)
     
-    # Initialize processor
-    processor = OllamaMetabolicProcessor(
+    # Initialize processor; the context warms the model once and closes the client after
+    async with OllamaMetabolicProcessor(
         model="deepseek-coder:6.7b",
         use_llm=True
-    )
-    
-    # Find 5 non-Twitter markdown files
-    data_dir = Path("/Users/darrenzal/GAIA/data")
-    files = []
-    for f in data_dir.rglob("*.md"):
-        if "twitter" not in str(f).lower():
-            files.append(f)
-            if len(files) >= 5:
-                break
-    
-    print(f"📂 Testing with {len(files)} documents:")
-    for f in files:
-        print(f"  - {f.name}")
-    
-    print("\n🤖 Processing with DeepSeek Coder...")
-    
-    # Process each file
-    for i, file_path in enumerate(files, 1):
-        print(f"\n[{i}/5] Processing: {file_path.name}")
-        result = await processor.process_document(file_path)
-        
-        if result and 'entities' in result:
-            print(f"  ✅ Extracted {len(result['entities'])} entities")
-            for entity in result['entities'][:2]:  # Show first 2
-                print(f"    - {entity.get('@type', 'Unknown')}: {entity.get('name', 'Unknown')[:50]}")
-        else:
-            print("  ❌ Failed to extract entities")
-    
-    # Print summary
-    processor.print_summary()
-    
-    # Save test results
-    output_path = Path("/Users/darrenzal/koi-research/quick-test-results.json")
-    processor.save_results(output_path)
-    
+    ) as processor:
+        # Find 5 non-Twitter markdown files
+        data_dir = Path("/Users/darrenzal/GAIA/data")
+        files = load_md_index(data_dir, refresh=REFRESH_INDEX)[:5]
+        
+        print(f"📂 Testing with {len(files)} documents:")
+        for f in files:
+            print(f"  - {f.name}")
+        
+        print("\n🤖 Processing with DeepSeek Coder...")
+        
+        # Process all files concurrently, bounded by the server's parallel slots
+        sem = asyncio.Semaphore(MAX_CONCURRENCY)
+        
+        async def run_one(file_path: Path):
+            async with sem:
+                return await processor.process_document(file_path)
+        
+        wall_start = time.time()
+        results = await asyncio.gather(*(run_one(f) for f in files), return_exceptions=True)
+        wall_time = time.time() - wall_start
+        
+        # Server-side compute time (prompt eval + decode, excluding queueing) exceeding
+        # wall time means requests really overlapped
+        overlap = processor.stats.llm_server_time / max(wall_time, 1e-9)
+        print(f"\n⏱️ Wall time {wall_time:.1f}s, server time {processor.stats.llm_server_time:.1f}s "
+              f"(overlap x{overlap:.1f}, concurrency {MAX_CONCURRENCY})")
+        if MAX_CONCURRENCY > 1 and overlap < 1.1:
+            print("  ⚠️ Requests were serialized; check OLLAMA_NUM_PARALLEL on the server")
+        
+        for i, (file_path, result) in enumerate(zip(files, results), 1):
+            print(f"\n[{i}/{len(files)}] Processed: {file_path.name}")
+            if isinstance(result, Exception):
+                print(f"  ❌ Error: {result}")
+            elif result and 'entities' in result:
+                print(f"  ✅ Extracted {len(result['entities'])} entities")
+                for entity in result['entities'][:2]:  # Show first 2
+                    print(f"    - {entity.get('@type', 'Unknown')}: {entity.get('name', 'Unknown')[:50]}")
+            else:
+                print("  ❌ Failed to extract entities")
+        
+        # Print summary
+        processor.print_summary()
+        
+        # Save test results
+        output_path = Path("/Users/darrenzal/koi-research/quick-test-results.json")
+        processor.save_results(output_path)
+        
     print(f"\n✅ Quick test complete! Results saved to {output_path}")
 
 if __name__ == "__main__":
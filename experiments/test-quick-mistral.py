@@ -6,7 +6,7 @@ sys.path.append('/Users/darrenzal/koi-research')
 from process_all_documents_mistral import ProductionMetabolicProcessor
 
 async def quick_test():
-    processor = ProductionMetabolicProcessor(model="mistral:7b")
+    processor = ProductionMetabolicProcessor(model="mistral:7b", use_cache=True)
     
     # Test on one file
     test_file = Path("/Users/darrenzal/koi-research/test-documents/scientific-paper.md")
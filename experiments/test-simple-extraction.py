@@ -3,20 +3,21 @@
 Simple single document extraction test
 """
 
-import ollama
+import asyncio
 import json
 from pathlib import Path
 
-def test_single_extraction():
+from file_index import read_head
+from llm_extract import generate_json
+from ollama_batcher import BATCHER
+
+async def test_single_extraction():
     """Test extraction on a single document snippet"""
     
     # Find one non-Twitter markdown file
     data_dir = Path("/Users/darrenzal/GAIA/data")
-    test_file = None
-    for f in data_dir.rglob("*.md"):
-        if "twitter" not in str(f).lower():
-            test_file = f
-            break
+    # Full path, not just the name: Twitter exports live in twitter/ directories
+    test_file = next((f for f in data_dir.rglob("*.md") if "twitter" not in str(f).lower()), None)
     
     if not test_file:
         print("No test file found")
@@ -25,7 +26,7 @@ def test_single_extraction():
     print(f"📄 Testing with: {test_file.name}")
     
     # Read first 500 characters
-    content = test_file.read_text(encoding='utf-8', errors='ignore')[:500]
+    content = read_head(test_file, 500)
     print(f"\n📝 Content preview:\n{content}\n")
     
     # Prepare extraction prompt
@@ -45,14 +46,14 @@ Return JSON array like:
     print("🤖 Calling DeepSeek Coder for extraction...")
     
     # Call Ollama
-    client = ollama.Client()
-    response = client.generate(
+    # Small token budget first; retried with a larger one only if the JSON is cut off
+    response = await generate_json(
+        BATCHER,
         model="deepseek-coder:6.7b",
         prompt=prompt,
         format="json",
         options={
-            "temperature": 0.3,
-            "num_predict": 1000  # Increased for complete JSON
+            "temperature": 0.3
         },
         stream=False
     )
@@ -74,4 +75,4 @@ Return JSON array like:
         print("Response was not valid JSON")
 
 if __name__ == "__main__":
-    test_single_extraction()
\ No newline at end of file
+    asyncio.run(test_single_extraction())
\ No newline at end of file
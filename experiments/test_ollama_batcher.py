@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Unit tests for ollama_batcher.Batcher against a fake client
+Run with: python -m unittest test_ollama_batcher
+"""
+
+import asyncio
+import time
+import unittest
+
+from ollama_batcher import Batcher
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeClient:
+    """Records concurrency; generate() raises synchronously on an unknown kwarg like a real signature would"""
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def generate(self, model, prompt, stream=False, options=None):
+        return self._generate(prompt, stream)
+
+    async def _generate(self, prompt, stream):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            if not stream:
+                self.in_flight -= 1
+        if stream:
+            return _CountingStream(self, [{"response": prompt, "done": False}, {"response": "", "done": True}])
+        return {"response": prompt}
+
+
+class _CountingStream(FakeStream):
+    def __init__(self, client, chunks):
+        super().__init__(chunks)
+        self.client = client
+
+    async def aclose(self):
+        if not self.closed:
+            self.client.in_flight -= 1
+        await super().aclose()
+
+
+class BatcherTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await self.batcher.close()
+
+    async def test_results_match_requests(self):
+        self.batcher = Batcher(FakeClient(), max_batch=4)
+        prompts = [f"p{i}" for i in range(10)]
+        results = await asyncio.gather(*(self.batcher.generate(model="m", prompt=p) for p in prompts))
+        self.assertEqual([r["response"] for r in results], prompts)
+
+    async def test_synchronous_error_resolves_future(self):
+        self.batcher = Batcher(FakeClient())
+        with self.assertRaises(TypeError):
+            await asyncio.wait_for(self.batcher.generate(model="m", prompt="p", bad_kwarg=1), 1)
+        # The flush loop survives and serves the next request
+        self.assertEqual((await asyncio.wait_for(self.batcher.generate(model="m", prompt="ok"), 1))["response"], "ok")
+
+    async def test_lone_request_is_not_delayed(self):
+        self.batcher = Batcher(FakeClient(delay=0), max_wait_ms=500)
+        start = time.perf_counter()
+        await self.batcher.generate(model="m", prompt="p")
+        self.assertLess(time.perf_counter() - start, 0.1)
+
+    async def test_streams_hold_their_slot_until_closed(self):
+        client = FakeClient()
+        self.batcher = Batcher(client, max_batch=2)
+
+        async def consume(prompt):
+            stream = await self.batcher.generate(model="m", prompt=prompt, stream=True)
+            try:
+                # Read the first chunk, then hang up mid-stream like StreamingJsonClient does
+                chunk = await stream.__anext__()
+                await asyncio.sleep(0.02)
+            finally:
+                await stream.aclose()
+            return chunk["response"]
+
+        results = await asyncio.wait_for(asyncio.gather(*(consume(f"p{i}") for i in range(6))), 2)
+        self.assertEqual(results, [f"p{i}" for i in range(6)])
+        self.assertLessEqual(client.max_in_flight, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,15 +8,47 @@ import asyncio
 import json
 import hashlib
 from datetime import datetime, timezone
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Set
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 from graphiti_core import Graphiti
 from graphiti_core.nodes import EpisodeType
+from graphiti_core.utils.bulk_utils import RawEpisode
+
+try:
+    import ahocorasick  # pyahocorasick: every keyword found in one pass over the text
+except ImportError:
+    ahocorasick = None
+
+try:
+    import orjson  # Faster episode bodies
+except ImportError:
+    orjson = None
 
 load_dotenv()
 
+# Concurrent add_episode calls in flight against Neo4j
+GRAPH_CONCURRENCY = int(os.environ.get("GRAPH_CONCURRENCY", "16"))
+
+# Documents extracted (and held in memory) at a time by the demo
+DOC_BATCH_SIZE = 32
+
+# Load episodes through add_episode_bulk (initial loads into an empty graph)
+BULK_LOAD = "--bulk" in sys.argv
+
+# Reused for every CID: json.dumps builds a fresh encoder per call whenever sort_keys is set
+_CID_ENCODER = json.JSONEncoder(sort_keys=True)
+
+
+def episode_body(entity: Dict) -> str:
+    """Entity JSON for a Graphiti episode"""
+    if orjson is not None:
+        return orjson.dumps(entity).decode()
+    return json.dumps(entity)
+
+
 class MetabolicExtractor:
     """Extract JSON-LD entities from documents using Regen's unified ontology"""
     
@@ -148,9 +180,29 @@ class MetabolicExtractor:
     Return a JSON array of extracted entities.
     """
     
+    # Substrings extract_basic_entities looks for in the lowercased document
+    KEYWORDS = ("regenerat", "communit", "caring", "coordinat", "governance",
+                "proposal", "carbon", "credit", "regen network")
+    
+    # Essence alignments in output order, each triggered by any of its keywords
+    ESSENCE_KEYWORDS = (
+        ("Re-Whole Value", frozenset({"regenerat"})),
+        ("Nest Caring", frozenset({"communit", "caring"})),
+        ("Harmonize Agency", frozenset({"coordinat", "governance"})),
+    )
+    
     def __init__(self, graphiti_client: Graphiti = None):
         self.graphiti = graphiti_client
         self.extracted_entities = []
+        self.graph_slots = asyncio.Semaphore(GRAPH_CONCURRENCY)
+        self.context = self.ONTOLOGY_CONTEXT["@context"]  # Shared by every entity and transformation
+        
+        self._keyword_automaton = None
+        if ahocorasick is not None:
+            self._keyword_automaton = ahocorasick.Automaton()
+            for keyword in self.KEYWORDS:
+                self._keyword_automaton.add_word(keyword, keyword)
+            self._keyword_automaton.make_automaton()
         
         # Ontology version tracking
         self.ontology_version = "orn:regen.ontology:unified-v1"
@@ -162,7 +214,7 @@ class MetabolicExtractor:
     
     def generate_cid(self, content: Any) -> str:
         """Generate a Content Identifier hash"""
-        content_str = json.dumps(content, sort_keys=True)
+        content_str = _CID_ENCODER.encode(content)
         hash_obj = hashlib.sha256(content_str.encode())
         return f"cid:sha256:{hash_obj.hexdigest()}"
     
@@ -172,14 +224,17 @@ class MetabolicExtractor:
                                    source: str = "unknown") -> List[Dict]:
         """Extract JSON-LD entities from a document"""
         
-        # Read document content
-        content = doc_path.read_text(encoding='utf-8')
+        # Read document content off the event loop so concurrent extractions overlap their I/O
+        content = await asyncio.to_thread(doc_path.read_text, encoding='utf-8')
+        
+        # One timestamp for the document and everything extracted from it
+        now_iso = datetime.now(tz=timezone.utc).isoformat()
         
         # Prepare extraction context
         extraction_context = {
             "document_content": content[:3000],  # Limit for LLM context
             "source": source,
-            "date": datetime.now(tz=timezone.utc).isoformat(),
+            "date": now_iso,
             "doc_type": doc_type
         }
         
@@ -189,42 +244,45 @@ class MetabolicExtractor:
         
         # Add JSON-LD context and ontology provenance
         for entity in entities:
-            entity.update(self.ONTOLOGY_CONTEXT)
             entity["@id"] = self.generate_rid(entity["@type"], entity.get("name", "unknown"))
+            # Hash only the entity's own fields; the shared context is pinned by ontologyVersion
             entity["_cid"] = self.generate_cid(entity)
+            entity["@context"] = self.context
             
             # Add ontology provenance tracking
             entity["wasExtractedUsing"] = self.ontology_version
             entity["ontologyVersion"] = self.ontology_cid
-            entity["extractedAt"] = datetime.now(tz=timezone.utc).isoformat()
+            entity["extractedAt"] = now_iso
             entity["extractedBy"] = "metabolic-extractor-v1"
             
         return entities
     
+    def find_keywords(self, lowered: str) -> Set[str]:
+        """KEYWORDS present in already-lowercased text"""
+        if self._keyword_automaton is not None:
+            return {keyword for _, keyword in self._keyword_automaton.iter(lowered)}
+        # A handful of C-level substring scans beats a Python-driven regex alternation here
+        return {keyword for keyword in self.KEYWORDS if keyword in lowered}
+    
     def extract_basic_entities(self, content: str, filename: str) -> List[Dict]:
         """Basic entity extraction without LLM (for demonstration)"""
         entities = []
+        found = self.find_keywords(content.lower())
         
         # Extract document as SemanticAsset
         doc_entity = {
             "@type": "SemanticAsset",
             "name": filename,
             "description": content[:200] if len(content) > 200 else content,
-            "alignsWith": []
+            # Check for essence alignments
+            "alignsWith": [essence for essence, keywords in self.ESSENCE_KEYWORDS
+                           if not keywords.isdisjoint(found)]
         }
         
-        # Check for essence alignments
-        if "regenerat" in content.lower():
-            doc_entity["alignsWith"].append("Re-Whole Value")
-        if "communit" in content.lower() or "caring" in content.lower():
-            doc_entity["alignsWith"].append("Nest Caring")
-        if "coordinat" in content.lower() or "governance" in content.lower():
-            doc_entity["alignsWith"].append("Harmonize Agency")
-            
         entities.append(doc_entity)
         
         # Look for governance acts
-        if "proposal" in content.lower():
+        if "proposal" in found:
             entities.append({
                 "@type": "GovernanceAct",
                 "name": f"Proposal in {filename}",
@@ -233,7 +291,7 @@ class MetabolicExtractor:
             })
         
         # Look for ecological assets
-        if "carbon" in content.lower() or "credit" in content.lower():
+        if "carbon" in found or "credit" in found:
             entities.append({
                 "@type": "EcologicalAsset",
                 "name": f"Carbon credits in {filename}",
@@ -242,7 +300,7 @@ class MetabolicExtractor:
             })
         
         # Look for agents
-        if "regen network" in content.lower():
+        if "regen network" in found:
             entities.append({
                 "@type": "Agent",
                 "name": "Regen Network",
@@ -252,42 +310,73 @@ class MetabolicExtractor:
             
         return entities
     
-    async def process_to_graph(self, entities: List[Dict]):
-        """Add extracted entities to Graphiti knowledge graph"""
+    async def process_to_graph(self, entities: List[Dict], bulk: bool = False):
+        """
+        Add extracted entities to Graphiti knowledge graph
+        With bulk=True the whole batch goes through one add_episode_bulk call instead
+        of a transaction per episode; Graphiti skips edge invalidation there, so it is
+        meant for initial loads
+        """
         if not self.graphiti:
             print("No Graphiti client configured, skipping graph insertion")
             return
-            
-        for entity in entities:
+        
+        reference_time = datetime.now(tz=timezone.utc)
+        
+        if bulk:
             try:
+                await self.graphiti.add_episode_bulk([
+                    RawEpisode(
+                        name=entity.get("@id", "unknown"),
+                        content=episode_body(entity),
+                        source_description=f"Metabolic extraction: {entity['@type']}",
+                        source=EpisodeType.message,
+                        reference_time=reference_time
+                    )
+                    for entity in entities
+                ])
+                print(f"✅ Added {len(entities)} entities in bulk")
+            except Exception as e:
+                print(f"⚠️ Could not add entities: {e}")
+            return
+        
+        async def add_one(entity: Dict):
+            async with self.graph_slots:
                 # Create episode for each entity
                 await self.graphiti.add_episode(
                     name=entity.get("@id", "unknown"),
-                    episode_body=json.dumps(entity),
+                    episode_body=episode_body(entity),
                     source_description=f"Metabolic extraction: {entity['@type']}",
-                    reference_time=datetime.now(tz=timezone.utc),
+                    reference_time=reference_time,
                     source=EpisodeType.message
                 )
+        
+        # Episodes go to Neo4j concurrently, bounded by graph_slots
+        results = await asyncio.gather(*(add_one(entity) for entity in entities), return_exceptions=True)
+        for entity, result in zip(entities, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ Could not add entity: {result}")
+            else:
                 print(f"✅ Added {entity['@type']}: {entity.get('name', 'unnamed')}")
-            except Exception as e:
-                print(f"⚠️ Could not add entity: {e}")
     
     async def track_transformation(self, 
                                   source_rid: str,
                                   target_rid: str,
-                                  process_type: str):
-        """Track a metabolic transformation in the graph"""
+                                  process_type: str,
+                                  add_to_graph: bool = True,
+                                  timestamp: str = None):
+        """Track a metabolic transformation in the graph; batch callers pass one shared timestamp"""
         transformation = {
-            "@context": self.ONTOLOGY_CONTEXT["@context"],
+            "@context": self.context,
             "@type": "Transformation",
             "@id": f"orn:regen.transform:{source_rid}-{process_type}-{target_rid}",
             "fromState": source_rid,
             "toState": target_rid,
             "process": process_type,
-            "timestamp": datetime.now(tz=timezone.utc).isoformat()
+            "timestamp": timestamp or datetime.now(tz=timezone.utc).isoformat()
         }
         
-        if self.graphiti:
+        if self.graphiti and add_to_graph:
             await self.process_to_graph([transformation])
         
         return transformation
@@ -320,31 +409,48 @@ async def demo_extraction():
     
     print(f"\n📄 Processing {len(sample_files)} sample documents...")
     
-    for doc_path in sample_files:
-        print(f"\n🔍 Extracting from: {doc_path.name}")
+    # Work through the corpus in fixed-size batches so only one batch of documents
+    # and entities is held at a time
+    for start in range(0, len(sample_files), DOC_BATCH_SIZE):
+        batch = sample_files[start:start + DOC_BATCH_SIZE]
         
-        # Extract entities
-        entities = await extractor.extract_from_document(
-            doc_path,
-            doc_type="twitter",
-            source="twitter"
-        )
+        # Extract entities from the batch concurrently; reads run in worker threads
+        extractions = await asyncio.gather(*(
+            extractor.extract_from_document(
+                doc_path,
+                doc_type="twitter",
+                source="twitter"
+            )
+            for doc_path in batch
+        ))
         
-        # Display extracted entities
-        for entity in entities:
-            print(f"  - {entity['@type']}: {entity.get('name', 'unnamed')}")
-            if entity.get('alignsWith'):
-                print(f"    Aligns with: {', '.join(entity['alignsWith'])}")
+        for doc_path, entities in zip(batch, extractions):
+            print(f"\n🔍 Extracting from: {doc_path.name}")
+            
+            # Display extracted entities
+            for entity in entities:
+                print(f"  - {entity['@type']}: {entity.get('name', 'unnamed')}")
+                if entity.get('alignsWith'):
+                    print(f"    Aligns with: {', '.join(entity['alignsWith'])}")
+            
+            # Track transformation (document → extracted knowledge)
+            source_rid = extractor.generate_rid("document", doc_path.stem)
+            now_iso = datetime.now(tz=timezone.utc).isoformat()
+            transformations = [
+                await extractor.track_transformation(
+                    source_rid,
+                    entity["@id"],
+                    "Extract",  # Metabolic process
+                    add_to_graph=False,
+                    timestamp=now_iso
+                )
+                for entity in entities
+            ]
+            
+            # One graph write per document rather than per transformation
+            if graphiti:
+                await extractor.process_to_graph(transformations, bulk=BULK_LOAD)
         
-        # Track transformation (document → extracted knowledge)
-        source_rid = extractor.generate_rid("document", doc_path.stem)
-        for entity in entities:
-            await extractor.track_transformation(
-                source_rid,
-                entity["@id"],
-                "Extract"  # Metabolic process
-            )
-    
     print("\n✨ Extraction complete!")
     print("\nNext steps:")
     print("1. Add OpenAI API key for full LLM extraction")
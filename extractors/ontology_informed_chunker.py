@@ -6,11 +6,36 @@ Creates semantically meaningful chunks based on extracted metabolic ontology ent
 
 import re
 import json
-from typing import List, Dict, Tuple, Optional, Set
+import hashlib
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Tuple, Optional, Set, Iterable, Iterator, Collection
 from dataclasses import dataclass
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 import numpy as np
 
+# Compiled entity-name patterns kept per chunker, least recently used dropped first
+PATTERN_CACHE_SIZE = 2048
+
+# Entity-name automata kept per chunker, for documents sharing the same entities
+AUTOMATON_CACHE_SIZE = 32
+
+# Exported documents memoized per chunker, so re-ingesting identical input skips chunking
+EXPORT_CACHE_SIZE = 1024
+
+# Category bits for entity types, combined per chunk into its metadata flags
+TYPE_GOVERNANCE = 1
+TYPE_ECOLOGICAL = 2
+
+try:
+    import ahocorasick  # pyahocorasick: all entity names located in one pass over the text
+except ImportError:
+    ahocorasick = None
+
+try:
+    import xxhash  # Faster document keys for the export cache
+except ImportError:
+    xxhash = None
+
 @dataclass
 class EntityMarker:
     """Marks where an entity appears in text"""
@@ -35,6 +60,27 @@ class SemanticChunk:
     discourse_type: Optional[str]  # If it contains discourse elements
     metadata: Dict
 
+@dataclass
+class _MarkerTable:
+    """Column view of a document's markers (sorted by start) for the chunking loops"""
+    markers: List[EntityMarker]
+    starts: List[int]
+    ends: np.ndarray  # int64 end positions
+    scores: np.ndarray  # float64 boundary score per marker: 1 + importance
+    
+    @classmethod
+    def from_markers(cls, markers: List[EntityMarker]) -> "_MarkerTable":
+        return cls(
+            markers=markers,
+            starts=[m.start_pos for m in markers],
+            ends=np.fromiter((m.end_pos for m in markers), dtype=np.int64, count=len(markers)),
+            scores=np.fromiter((1 + m.importance for m in markers), dtype=np.float64, count=len(markers))
+        )
+    
+    def window(self, start: int, end: int) -> Tuple[int, int]:
+        """Index range of the markers starting within [start, end]"""
+        return bisect_left(self.starts, start), bisect_right(self.starts, end)
+
 class OntologyInformedChunker:
     """
     Chunks documents based on extracted ontology entities
@@ -72,6 +118,35 @@ class OntologyInformedChunker:
             'regen:Conclusion': 0.85,
             'regen:Theory': 0.75
         }
+        
+        # Category bits per entity type; types outside the table are added as they are seen
+        self._type_flags = {t: self._categorize_type(t) for t in self.entity_importance}
+        
+        # Discourse type of a chunk, from the entity types it contains
+        self.discourse_types = {
+            'regen:Question': 'question',
+            'regen:Hypothesis': 'hypothesis',
+            'regen:Claim': 'claim',
+            'regen:Evidence': 'evidence',
+            'regen:Experiment': 'experiment',
+            'regen:Result': 'result',
+            'regen:Conclusion': 'conclusion',
+            'regen:Theory': 'theory'
+        }
+        
+        # Compiled entity-name patterns and automata, kept across documents sharing an ontology
+        self._pattern_cache: OrderedDict = OrderedDict()
+        self._automaton_cache: OrderedDict = OrderedDict()
+        self._export_cache: OrderedDict = OrderedDict()
+        
+        # Document-level patterns, compiled once; every process name in a single alternation,
+        # one group per process so a match's lastindex names it
+        self._process_re = re.compile(
+            r'\b(?:' + '|'.join(f'({re.escape(p)})' for p in self.metabolic_processes) + r')\b',
+            re.IGNORECASE
+        )
+        self._paragraph_re = re.compile(r'\n\n+')
+        self._sentence_end_re = re.compile(r'[.!?][\s\n]')
     
     def chunk_document(self, 
                       text: str, 
@@ -88,24 +163,104 @@ class OntologyInformedChunker:
         Returns:
             List of semantic chunks
         """
+        return list(self.iter_chunks(text, extracted_entities, document_metadata))
+    
+    def iter_chunks(self,
+                    text: str,
+                    extracted_entities: List[Dict],
+                    document_metadata: Dict = None) -> Iterator[SemanticChunk]:
+        """
+        Yield the chunks of chunk_document one at a time, each with its metadata
+        already filled in, so a consumer can process or export them as they come
+        """
+        entity_markers, boundaries = self._prepare_document(text, extracted_entities)
+        
+        # 3. Create chunks respecting boundaries, enhancing each with metadata
+        entity_lookup = {e.get('@id'): e for e in extracted_entities}
+        for chunk in self._create_chunks(text, entity_markers, boundaries):
+            self._enhance_chunk_metadata(chunk, entity_lookup)
+            yield chunk
+    
+    def chunk_document_json(self,
+                            text: str,
+                            extracted_entities: List[Dict],
+                            document_metadata: Dict = None) -> Iterator[Dict]:
+        """
+        Yield the rows export_chunks would give for chunk_document, built directly as
+        dicts without SemanticChunk objects; entity_types keep first-seen order
+        """
+        entity_markers, boundaries = self._prepare_document(text, extracted_entities)
+        
+        entity_lookup = {e.get('@id'): e for e in extracted_entities}
+        for start, end, content, chunk_entities in self._chunk_spans(text, entity_markers, boundaries):
+            entity_ids = [m.entity_id for m in chunk_entities]
+            entity_types = list(dict.fromkeys(m.entity_type for m in chunk_entities))
+            yield {
+                'content': content,
+                'start_pos': start,
+                'end_pos': end,
+                'entities': entity_ids,
+                'entity_types': entity_types,
+                **self._chunk_annotations(content, entity_ids, entity_types, entity_lookup)
+            }
+    
+    def export_document(self,
+                        text: str,
+                        extracted_entities: List[Dict],
+                        document_metadata: Dict = None) -> List[Dict]:
+        """
+        chunk_document_json's rows as a list, memoized by a hash of the text and entities
+        so a retried or duplicate document is not chunked again. Rows are kept as JSON
+        text and parsed per call, so callers always get their own copy.
+        """
+        key = self._document_key(text, extracted_entities)
+        cached = self._export_cache.get(key)
+        if cached is not None:
+            self._export_cache.move_to_end(key)
+            return json.loads(cached)
+        
+        rows = list(self.chunk_document_json(text, extracted_entities, document_metadata))
+        self._export_cache[key] = json.dumps(rows)
+        if len(self._export_cache) > EXPORT_CACHE_SIZE:
+            self._export_cache.popitem(last=False)
+        return rows
+    
+    @staticmethod
+    def _document_key(text: str, extracted_entities: List[Dict]) -> str:
+        """128-bit digest of a document's text and entities"""
+        digest = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+        digest.update(text.encode('utf-8', 'surrogatepass'))
+        digest.update(b'\0')
+        digest.update(json.dumps(extracted_entities, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _prepare_document(self, text: str, extracted_entities: List[Dict]) -> Tuple[List[EntityMarker], np.ndarray]:
+        """Locate the entities and the candidate chunk boundaries of a document"""
+        # Lowercased once for the whole document; only usable by position when
+        # lowercasing kept every character's offset
+        text_lower = text.lower()
+        if len(text_lower) != len(text):
+            text_lower = None
+        
         # 1. Find entity positions in text
-        entity_markers = self._locate_entities_in_text(text, extracted_entities)
+        entity_markers = self._locate_entities_in_text(text, extracted_entities, text_lower)
         
         # 2. Identify natural boundaries
         boundaries = self._identify_boundaries(text, entity_markers)
         
-        # 3. Create chunks respecting boundaries
-        chunks = self._create_chunks(text, entity_markers, boundaries)
-        
-        # 4. Enhance chunks with metadata
-        chunks = self._enhance_chunk_metadata(chunks, extracted_entities)
-        
-        return chunks
+        return entity_markers, boundaries
     
-    def _locate_entities_in_text(self, text: str, entities: List[Dict]) -> List[EntityMarker]:
-        """Find where entities appear in the text"""
+    def _locate_entities_in_text(self,
+                                 text: str,
+                                 entities: List[Dict],
+                                 text_lower: Optional[str] = None) -> List[EntityMarker]:
+        """Find where entities appear in the text (text_lower: position-aligned text.lower())"""
         markers = []
-        text_lower = text.lower()
+        
+        # Exact matches for every entity name in one pass, when the automaton can be used
+        exact_spans = None
+        if ahocorasick is not None and text_lower is not None:
+            exact_spans = self._find_exact_spans(text_lower, entities)
         
         for entity in entities:
             entity_name = entity.get('name', '')
@@ -114,27 +269,40 @@ class OntologyInformedChunker:
                 
             # Try to find entity text in document
             # First try exact match
-            pattern = re.escape(entity_name)
-            matches = list(re.finditer(pattern, text, re.IGNORECASE))
+            name_lower = entity_name.lower()
+            if exact_spans is not None and len(name_lower) == len(entity_name):
+                spans = exact_spans.get(name_lower, [])
+            else:
+                pattern = self._entity_pattern(entity_name, re.escape(entity_name))
+                spans = [match.span() for match in pattern.finditer(text)]
             
-            if not matches and ' ' in entity_name:
+            if not spans and ' ' in entity_name:
                 # Try partial match for multi-word entities
                 words = entity_name.split()
                 if len(words) > 1:
                     # Try first and last word
-                    pattern = re.escape(words[0]) + r'.*?' + re.escape(words[-1])
-                    matches = list(re.finditer(pattern, text, re.IGNORECASE))[:1]
+                    pattern = self._entity_pattern(
+                        (words[0], words[-1]), re.escape(words[0]) + r'.*?' + re.escape(words[-1])
+                    )
+                    match = pattern.search(text)
+                    spans = [match.span()] if match else []
+            
+            if not spans:
+                continue
             
-            for match in matches:
+            # Same id, type and importance for every occurrence of this entity
+            entity_id = entity.get('@id', '')
+            entity_type = entity.get('@type', 'Unknown')
+            importance = self.entity_importance.get(entity.get('@type', ''), 0.5)
+            
+            for start, end in spans:
                 marker = EntityMarker(
-                    entity_id=entity.get('@id', ''),
-                    entity_type=entity.get('@type', 'Unknown'),
-                    start_pos=match.start(),
-                    end_pos=match.end(),
-                    text=match.group(),
-                    importance=self.entity_importance.get(
-                        entity.get('@type', ''), 0.5
-                    ),
+                    entity_id=entity_id,
+                    entity_type=entity_type,
+                    start_pos=start,
+                    end_pos=end,
+                    text=text[start:end],
+                    importance=importance,
                     properties=entity
                 )
                 markers.append(marker)
@@ -143,191 +311,274 @@ class OntologyInformedChunker:
         markers.sort(key=lambda x: x.start_pos)
         return markers
     
-    def _identify_boundaries(self, text: str, markers: List[EntityMarker]) -> List[int]:
+    def _entity_pattern(self, key, source: str) -> re.Pattern:
+        """Case-insensitive compiled pattern for key, from an LRU of PATTERN_CACHE_SIZE entries"""
+        pattern = self._pattern_cache.get(key)
+        if pattern is not None:
+            self._pattern_cache.move_to_end(key)
+            return pattern
+        
+        pattern = self._pattern_cache[key] = re.compile(source, re.IGNORECASE)
+        if len(self._pattern_cache) > PATTERN_CACHE_SIZE:
+            self._pattern_cache.popitem(last=False)
+        return pattern
+    
+    def _find_exact_spans(self, text_lower: str, entities: List[Dict]) -> Dict[str, List[Tuple[int, int]]]:
+        """
+        Scan the lowercased text once with an Aho-Corasick automaton over all entity names.
+        Returns non-overlapping (start, end) spans per lowercased name, as finditer would.
+        """
+        spans = defaultdict(list)
+        automaton = self._entity_automaton(entities)
+        if automaton is None:
+            return spans
+        
+        # Hits arrive ordered by end position; keep each name's leftmost non-overlapping ones
+        for end_index, name_lower in automaton.iter(text_lower):
+            start = end_index - len(name_lower) + 1
+            name_spans = spans[name_lower]
+            if not name_spans or start >= name_spans[-1][1]:
+                name_spans.append((start, end_index + 1))
+        return spans
+    
+    def _entity_automaton(self, entities: List[Dict]):
+        """
+        Automaton over the lowercased entity names, reused for documents with the same
+        names; the least recently used ones are dropped beyond AUTOMATON_CACHE_SIZE
+        """
+        names = frozenset(name.lower() for name in (e.get('name', '') for e in entities) if name)
+        if not names:
+            return None
+        
+        automaton = self._automaton_cache.get(names)
+        if automaton is not None:
+            self._automaton_cache.move_to_end(names)
+            return automaton
+        
+        automaton = ahocorasick.Automaton()
+        for name_lower in names:
+            automaton.add_word(name_lower, name_lower)
+        automaton.make_automaton()
+        
+        self._automaton_cache[names] = automaton
+        if len(self._automaton_cache) > AUTOMATON_CACHE_SIZE:
+            self._automaton_cache.popitem(last=False)
+        return automaton
+    
+    def preload_ontology(self, entities: List[Dict]):
+        """Build the entity-name automaton ahead of chunking documents that share these entities"""
+        if ahocorasick is not None:
+            self._entity_automaton(entities)
+    
+    def _identify_boundaries(self, text: str, markers: List[EntityMarker]) -> np.ndarray:
         """
         Identify natural boundaries for chunking
         Based on: entity positions, paragraphs, sentences
+        Returns the sorted, distinct positions as an int64 array
         """
-        boundaries = set([0, len(text)])
+        boundaries = [0, len(text)]
         
         # Add paragraph boundaries
-        for match in re.finditer(r'\n\n+', text):
-            boundaries.add(match.start())
+        boundaries.extend(match.start() for match in self._paragraph_re.finditer(text))
         
         # Add high-importance entity boundaries
         for marker in markers:
             if marker.importance >= 0.85:
                 # Add boundary before important entities
-                boundaries.add(marker.start_pos)
+                boundaries.append(marker.start_pos)
                 
                 # For Questions and Hypotheses, find the end of their context
                 if marker.entity_type in ['regen:Question', 'regen:Hypothesis']:
                     # Look for next sentence or paragraph end
                     next_boundary = self._find_next_sentence_end(text, marker.end_pos)
                     if next_boundary:
-                        boundaries.add(next_boundary)
+                        boundaries.append(next_boundary)
         
         # Add boundaries for metabolic process transitions
-        for process in self.metabolic_processes:
-            pattern = rf'\b{process}\b'
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                boundaries.add(match.start())
+        boundaries.extend(match.start() for match in self._process_re.finditer(text))
         
-        return sorted(list(boundaries))
+        return np.unique(np.array(boundaries, dtype=np.int64))
     
     def _find_next_sentence_end(self, text: str, start_pos: int) -> Optional[int]:
         """Find the next sentence ending after position"""
-        sentence_end_pattern = r'[.!?][\s\n]'
-        match = re.search(sentence_end_pattern, text[start_pos:])
+        # Search from start_pos in place rather than copying the rest of the text
+        match = self._sentence_end_re.search(text, start_pos)
         if match:
-            return start_pos + match.end()
+            return match.end()
         return None
     
     def _create_chunks(self, 
                       text: str, 
                       markers: List[EntityMarker],
-                      boundaries: List[int]) -> List[SemanticChunk]:
+                      boundaries: np.ndarray) -> Iterator[SemanticChunk]:
         """Create chunks respecting boundaries and size constraints"""
-        chunks = []
+        for start, end, chunk_text, chunk_entities in self._chunk_spans(text, markers, boundaries):
+            yield SemanticChunk(
+                content=chunk_text,
+                start_pos=start,
+                end_pos=end,
+                entities=[m.entity_id for m in chunk_entities],
+                entity_types=set(m.entity_type for m in chunk_entities),
+                metabolic_process=None,  # Will be set in enhancement
+                essence_alignments=[],   # Will be set in enhancement
+                discourse_type=None,     # Will be set in enhancement
+                metadata={}
+            )
+    
+    def _chunk_spans(self,
+                     text: str,
+                     markers: List[EntityMarker],
+                     boundaries: np.ndarray) -> Iterator[Tuple[int, int, str, List[EntityMarker]]]:
+        """Yield (start, end, stripped content, contained markers) for each chunk"""
         current_pos = 0
+        marker_table = _MarkerTable.from_markers(markers)
         
         while current_pos < len(text):
             # Find optimal chunk end
             chunk_end = self._find_optimal_chunk_end(
-                text, current_pos, boundaries, markers
+                text, current_pos, boundaries, markers, marker_table
             )
             
             # Create chunk
             chunk_text = text[current_pos:chunk_end].strip()
             
             if len(chunk_text) >= self.min_chunk_size or current_pos == 0:
-                # Find entities in this chunk
-                chunk_entities = [
-                    marker for marker in markers
-                    if marker.start_pos >= current_pos and marker.end_pos <= chunk_end
-                ]
+                # Find entities in this chunk, among the markers starting inside it
+                lo, hi = marker_table.window(current_pos, chunk_end)
+                chunk_entities = [marker for marker in markers[lo:hi] if marker.end_pos <= chunk_end]
                 
-                chunk = SemanticChunk(
-                    content=chunk_text,
-                    start_pos=current_pos,
-                    end_pos=chunk_end,
-                    entities=[m.entity_id for m in chunk_entities],
-                    entity_types=set(m.entity_type for m in chunk_entities),
-                    metabolic_process=None,  # Will be set in enhancement
-                    essence_alignments=[],   # Will be set in enhancement
-                    discourse_type=None,     # Will be set in enhancement
-                    metadata={}
-                )
-                chunks.append(chunk)
+                yield current_pos, chunk_end, chunk_text, chunk_entities
             
-            # Move to next position with overlap
-            current_pos = chunk_end - self.overlap_size
-            if current_pos <= chunks[-1].start_pos if chunks else 0:
-                current_pos = chunk_end
-        
-        return chunks
+            # The text is covered once a chunk reaches its end; stepping back by the
+            # overlap from there would only revisit a tail too short to keep
+            if chunk_end >= len(text):
+                break
+            
+            # Move to next position with overlap, always moving forward
+            next_pos = chunk_end - self.overlap_size
+            if next_pos <= current_pos:
+                next_pos = max(chunk_end, current_pos + 1)
+            current_pos = next_pos
     
     def _find_optimal_chunk_end(self,
                                text: str,
                                start_pos: int,
-                               boundaries: List[int],
-                               markers: List[EntityMarker]) -> int:
+                               boundaries: np.ndarray,
+                               markers: List[EntityMarker],
+                               marker_table: Optional[_MarkerTable] = None) -> int:
         """Find the best end position for a chunk"""
         # Maximum possible end
         max_end = min(start_pos + self.max_chunk_size, len(text))
         
-        # Find boundaries within range
-        valid_boundaries = [
-            b for b in boundaries 
-            if start_pos + self.min_chunk_size <= b <= max_end
+        # Find boundaries within range: a slice of the sorted array
+        valid_boundaries = boundaries[
+            np.searchsorted(boundaries, start_pos + self.min_chunk_size):
+            np.searchsorted(boundaries, max_end, side='right')
         ]
         
-        if valid_boundaries:
-            # Prefer boundary that includes complete entities
-            best_boundary = valid_boundaries[0]
-            best_score = 0
+        if len(valid_boundaries):
+            # A single candidate needs no scoring
+            if len(valid_boundaries) == 1:
+                return int(valid_boundaries[0])
             
-            for boundary in valid_boundaries:
-                # Count complete entities
-                complete_entities = sum(
-                    1 for m in markers
-                    if m.start_pos >= start_pos and m.end_pos <= boundary
-                )
-                
-                # Prefer boundaries that complete high-importance entities
-                importance_sum = sum(
-                    m.importance for m in markers
-                    if m.start_pos >= start_pos and m.end_pos <= boundary
-                )
-                
-                score = complete_entities + importance_sum
-                if score > best_score:
-                    best_score = score
-                    best_boundary = boundary
+            # Only markers starting within [start_pos, max_end] can be complete at a boundary;
+            # markers are sorted by start, so that window is found by binary search
+            if marker_table is None:
+                marker_table = _MarkerTable.from_markers(markers)
+            lo, hi = marker_table.window(start_pos, max_end)
+            if lo == hi:
+                # No entities to complete: every boundary scores zero and the first wins
+                return int(valid_boundaries[0])
+            window_ends = marker_table.ends[lo:hi]
+            window_scores = marker_table.scores[lo:hi]
+            order = np.argsort(window_ends, kind='stable')
+            
+            # Score every boundary at once: entity count plus importance of the markers
+            # complete by it, read off running totals over the window ordered by end
+            running_scores = np.concatenate(([0.0], np.cumsum(window_scores[order])))
+            complete_entities = np.searchsorted(window_ends[order], valid_boundaries, side='right')
+            scores = running_scores[complete_entities]
             
-            return best_boundary
+            # Prefer boundary that includes complete entities (the first, among equal scores)
+            return int(valid_boundaries[scores.argmax()])
         
         # No good boundary found, use max size
         return max_end
     
-    def _enhance_chunk_metadata(self, 
-                               chunks: List[SemanticChunk],
-                               entities: List[Dict]) -> List[SemanticChunk]:
-        """Add rich metadata to chunks based on entities"""
-        # Create entity lookup
-        entity_lookup = {e.get('@id'): e for e in entities}
-        
-        for chunk in chunks:
-            # Determine metabolic process
-            chunk_text_lower = chunk.content.lower()
-            for process in self.metabolic_processes:
-                if process.lower() in chunk_text_lower:
-                    chunk.metabolic_process = process
-                    break
-            
-            # Collect essence alignments
-            alignments = set()
-            for entity_id in chunk.entities:
-                if entity_id in entity_lookup:
-                    entity = entity_lookup[entity_id]
-                    if 'alignsWith' in entity:
-                        aligns = entity['alignsWith']
-                        if isinstance(aligns, list):
-                            alignments.update(aligns)
-                        elif aligns:
-                            alignments.add(aligns)
-            chunk.essence_alignments = list(alignments)
-            
-            # Determine discourse type
-            discourse_types = {
-                'regen:Question': 'question',
-                'regen:Hypothesis': 'hypothesis',
-                'regen:Claim': 'claim',
-                'regen:Evidence': 'evidence',
-                'regen:Experiment': 'experiment',
-                'regen:Result': 'result',
-                'regen:Conclusion': 'conclusion',
-                'regen:Theory': 'theory'
-            }
-            
-            for entity_type in chunk.entity_types:
-                if entity_type in discourse_types:
-                    chunk.discourse_type = discourse_types[entity_type]
-                    break
-            
-            # Add metadata
-            chunk.metadata = {
-                'entity_count': len(chunk.entities),
-                'unique_entity_types': len(chunk.entity_types),
-                'has_governance': any('Governance' in t for t in chunk.entity_types),
-                'has_ecological': any('Ecological' in t for t in chunk.entity_types),
-                'chunk_size': len(chunk.content)
-            }
+    def _enhance_chunk_metadata(self, chunk: SemanticChunk, entity_lookup: Dict[str, Dict]):
+        """Add rich metadata to a chunk based on its entities"""
+        annotations = self._chunk_annotations(
+            chunk.content, chunk.entities, chunk.entity_types, entity_lookup
+        )
+        chunk.metabolic_process = annotations['metabolic_process']
+        chunk.essence_alignments = annotations['essence_alignments']
+        chunk.discourse_type = annotations['discourse_type']
+        chunk.metadata = annotations['metadata']
+    
+    def _chunk_annotations(self,
+                           content: str,
+                           entity_ids: List[str],
+                           entity_types: Collection[str],
+                           entity_lookup: Dict[str, Dict]) -> Dict:
+        """Metabolic process, essence alignments, discourse type and metadata of a chunk"""
+        # Determine metabolic process: the first one named, as a whole word, in the chunk
+        metabolic_process = None
+        match = self._process_re.search(content)
+        if match:
+            metabolic_process = self.metabolic_processes[match.lastindex - 1]
+        
+        # Collect essence alignments
+        alignments = set()
+        for entity_id in entity_ids:
+            if entity_id in entity_lookup:
+                entity = entity_lookup[entity_id]
+                if 'alignsWith' in entity:
+                    aligns = entity['alignsWith']
+                    if isinstance(aligns, list):
+                        alignments.update(aligns)
+                    elif aligns:
+                        alignments.add(aligns)
+        
+        # Determine discourse type
+        discourse_type = None
+        for entity_type in entity_types:
+            if entity_type in self.discourse_types:
+                discourse_type = self.discourse_types[entity_type]
+                break
         
-        return chunks
+        # Combine the category bits of the chunk's entity types
+        flags = 0
+        for entity_type in entity_types:
+            type_flags = self._type_flags.get(entity_type)
+            if type_flags is None:
+                type_flags = self._type_flags[entity_type] = self._categorize_type(entity_type)
+            flags |= type_flags
+        
+        return {
+            'metabolic_process': metabolic_process,
+            'essence_alignments': list(alignments),
+            'discourse_type': discourse_type,
+            'metadata': {
+                'entity_count': len(entity_ids),
+                'unique_entity_types': len(entity_types),
+                'has_governance': bool(flags & TYPE_GOVERNANCE),
+                'has_ecological': bool(flags & TYPE_ECOLOGICAL),
+                'chunk_size': len(content)
+            }
+        }
+    
+    @staticmethod
+    def _categorize_type(entity_type: str) -> int:
+        """Category bits for an entity type, from its name"""
+        flags = 0
+        if 'Governance' in entity_type:
+            flags |= TYPE_GOVERNANCE
+        if 'Ecological' in entity_type:
+            flags |= TYPE_ECOLOGICAL
+        return flags
     
-    def export_chunks(self, chunks: List[SemanticChunk]) -> List[Dict]:
-        """Export chunks to JSON-serializable format"""
+    def export_chunks(self, chunks: Iterable[SemanticChunk]) -> List[Dict]:
+        """Export chunks (a list or iter_chunks' generator) to JSON-serializable format"""
         return [
             {
                 'content': chunk.content,
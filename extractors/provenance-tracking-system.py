@@ -6,12 +6,49 @@ Tracks complete history of entity observations and transformations
 
 import hashlib
 import json
-from typing import Dict, List, Set, Optional, Tuple
+from typing import Dict, List, Set, Optional, Tuple, Union
 from datetime import datetime, timezone
 from dataclasses import dataclass, field
-import uuid
+import itertools
+import secrets
+import sys
+from functools import lru_cache
 
-@dataclass
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from datasketch import MinHash, MinHashLSH
+except ImportError:
+    MinHash = MinHashLSH = None
+
+_sha256 = hashlib.sha256
+
+# Punctuation dropped by normalize_name in a single translate pass
+_NAME_PUNCT = str.maketrans('', '', '.,')
+
+# MinHash-LSH blocking for fuzzy name matching (needs datasketch)
+LSH_THRESHOLD = 0.85
+LSH_PERMUTATIONS = 64
+
+def name_shingles(normalized: str) -> Set[str]:
+    """Character 3-grams of a normalized name"""
+    return {normalized[i:i + 3] for i in range(max(len(normalized) - 2, 1))}
+
+def _intern(value):
+    """Share one string object per distinct type/source/method across observations"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+def quantize_confidence(confidence: float) -> int:
+    """Confidence as integer hundredths; extractors only emit two decimals"""
+    try:
+        return round(float(confidence) * 100)
+    except (TypeError, ValueError):
+        return 100  # Unparseable LLM scores fall back to the default
+
+@dataclass(slots=True)
 class EntityObservation:
     """Single observation of an entity in a document"""
     observation_id: str  # Unique ID for this observation
@@ -23,20 +60,29 @@ class EntityObservation:
     extraction_timestamp: str
     extraction_method: str
     position: Dict  # Where in document (line, offset, etc)
-    confidence: float = 1.0
+    normalized_name: str  # normalize_name(name), computed once at extraction
+    confidence_q: int = 100  # Fixed-point confidence, hundredths
+    
+    @property
+    def confidence(self) -> float:
+        return self.confidence_q / 100
 
-@dataclass
+@dataclass(slots=True)
 class EntityResolution:
     """Records the resolution/linking of multiple observations to canonical entity"""
     resolution_id: str
     canonical_id: str
     observation_ids: List[str]
     resolution_method: str
-    resolution_confidence: float
+    resolution_confidence_q: int  # Fixed-point confidence, hundredths
     resolution_timestamp: str
     resolution_evidence: Dict  # Why these were linked
+    
+    @property
+    def resolution_confidence(self) -> float:
+        return self.resolution_confidence_q / 100
 
-@dataclass 
+@dataclass(slots=True)
 class CanonicalEntity:
     """The resolved canonical entity with full provenance"""
     canonical_id: str
@@ -48,6 +94,7 @@ class CanonicalEntity:
     resolutions: List[EntityResolution]
     created_at: str
     last_updated: str
+    source_documents: Set[str] = field(default_factory=set)  # Distinct sources across observations
 
 class ProvenanceTracker:
     """
@@ -65,14 +112,38 @@ class ProvenanceTracker:
         self.name_to_observations = {}  # normalized_name -> [observation_ids]
         self.doc_to_observations = {}   # doc_path -> [observation_ids]
         self.canonical_to_observations = {}  # canonical_id -> [observation_ids]
+        self.alias_index: Dict[Tuple[str, str], str] = {}  # (entity_type, normalized_name) -> canonical_id
+        # (canonical_id, normalized_name) keyed MinHash index for fuzzy candidates,
+        # built on the first fuzzy query so exact-match ingest never pays for it
+        self.name_lsh = None
+        
+        # Process-local counters behind a random per-tracker prefix keep ids unique across runs
+        self._id_prefix = secrets.token_hex(4)
+        self._obs_counter = itertools.count()
+        self._res_counter = itertools.count()
+        self._ent_counter = itertools.count()
         
         # CAT tracking
         self.transformations = []  # List of all transformations
+        self.trans_from_state: Dict[str, List[int]] = {}  # id in fromState -> transformation indices
+        self.trans_to_state: Dict[str, List[int]] = {}    # id in toState -> transformation indices
         
-    def generate_cid(self, content: str) -> str:
-        """Generate content ID"""
-        hash_obj = hashlib.sha256(content.encode())
-        return f"cid:sha256:{hash_obj.hexdigest()[:16]}"
+    def generate_cid(self, content: Union[str, bytes]) -> str:
+        """Generate content ID; pass bytes to skip the encode"""
+        if isinstance(content, str):
+            content = content.encode()
+        return f"cid:sha256:{_sha256(content).hexdigest()[:16]}"
+    
+    def transformation_cid(self, transformation: Dict) -> str:
+        """Content ID of a transformation over its compact, key-sorted JSON"""
+        if orjson is not None:
+            blob = orjson.dumps(transformation, option=orjson.OPT_SORT_KEYS)
+        else:
+            # Matches orjson's bytes for the values transformations carry (only tiny
+            # floats like 1e-07 vs 1e-7 differ), so CIDs rarely depend on which is installed
+            blob = json.dumps(transformation, sort_keys=True, separators=(',', ':'),
+                              ensure_ascii=False).encode()
+        return f"cid:blake2b:{hashlib.blake2b(blob, digest_size=8).hexdigest()}"
     
     def generate_rid(self, resource_type: str, identifier: str) -> str:
         """Generate resource ID"""
@@ -84,26 +155,27 @@ class ProvenanceTracker:
         Record a single entity observation from a document
         This is the raw extraction, before any deduplication
         """
-        observation_id = f"obs:{uuid.uuid4().hex[:12]}"
+        observation_id = f"obs:{self._id_prefix}{next(self._obs_counter):08x}"
         
         observation = EntityObservation(
             observation_id=observation_id,
-            entity_type=entity.get('@type', 'Unknown'),
+            entity_type=_intern(entity.get('@type', 'Unknown')),
             name=entity.get('name', ''),
             properties={k: v for k, v in entity.items() 
                        if k not in ['@type', 'name', '@id']},
-            source_document=source_doc,
+            source_document=_intern(source_doc),
             source_cid=source_cid,
             extraction_timestamp=datetime.now(tz=timezone.utc).isoformat(),
-            extraction_method=method,
+            extraction_method=_intern(method),
             position=position or {},
-            confidence=entity.get('confidence', 1.0)
+            normalized_name=self.normalize_name(entity.get('name', '')),
+            confidence_q=quantize_confidence(entity.get('confidence', 1.0))
         )
         
         self.observations[observation_id] = observation
         
         # Update indices
-        normalized = self.normalize_name(entity.get('name', ''))
+        normalized = observation.normalized_name
         if normalized not in self.name_to_observations:
             self.name_to_observations[normalized] = []
         self.name_to_observations[normalized].append(observation_id)
@@ -126,29 +198,64 @@ class ProvenanceTracker:
         
         return observation_id
     
-    def normalize_name(self, name: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=100_000)
+    def normalize_name(name: str) -> str:
         """Normalize for matching"""
-        return name.lower().strip().replace('.', '').replace(',', '')
+        return name.lower().strip().translate(_NAME_PUNCT)
+    
+    def name_minhash(self, shingles: Set[str]):
+        """MinHash signature of a name's shingles"""
+        minhash = MinHash(num_perm=LSH_PERMUTATIONS)
+        for shingle in shingles:
+            minhash.update(shingle.encode())
+        return minhash
+    
+    def fuzzy_index(self):
+        """The MinHash-LSH over every canonical alias, built from the canonicals on first use"""
+        if self.name_lsh is None and MinHashLSH is not None:
+            self.name_lsh = MinHashLSH(threshold=LSH_THRESHOLD, num_perm=LSH_PERMUTATIONS)
+            for canonical_id, canonical in self.canonical.items():
+                for obs in canonical.observations:
+                    self._index_alias(canonical_id, obs.normalized_name)
+        return self.name_lsh
+    
+    def _index_alias(self, canonical_id: str, normalized_name: str):
+        """Add an alias to the fuzzy index, once it exists"""
+        lsh_key = (canonical_id, normalized_name)
+        if self.name_lsh is not None and lsh_key not in self.name_lsh:
+            self.name_lsh.insert(lsh_key, self.name_minhash(name_shingles(normalized_name)))
     
-    def find_matching_canonical(self, observation_id: str, threshold: float = 0.85) -> Optional[str]:
+    def find_matching_canonical(self, observation_id: str, threshold: float = 0.85,
+                                fuzzy: bool = False) -> Optional[str]:
         """
         Find if this observation matches an existing canonical entity
         Returns canonical_id if match found, None otherwise
+        With fuzzy=True (and datasketch installed), falls back to the alias with the
+        highest shingle Jaccard similarity >= threshold among the LSH candidates
         """
         observation = self.observations[observation_id]
-        normalized = self.normalize_name(observation.name)
+        key = (observation.entity_type, observation.normalized_name)
         
-        # Check exact matches first
-        for canonical_id, canonical in self.canonical.items():
-            if observation.entity_type != canonical.entity_type:
-                continue
-                
-            # Check all known names for this canonical entity
-            for name in canonical.all_names:
-                if self.normalize_name(name) == normalized:
-                    return canonical_id
+        # Exact match on any known name of a canonical entity of the same type
+        match = self.alias_index.get(key)
+        if match:
+            return match
         
-        # TODO: Add fuzzy matching, property matching, etc.
+        name_lsh = self.fuzzy_index() if fuzzy else None
+        if name_lsh is not None:
+            shingles = name_shingles(observation.normalized_name)
+            best, best_score = None, threshold
+            for canonical_id, name in name_lsh.query(self.name_minhash(shingles)):
+                if self.canonical[canonical_id].entity_type != observation.entity_type:
+                    continue
+                other = name_shingles(name)
+                score = len(shingles & other) / len(shingles | other)
+                if score >= best_score:
+                    best, best_score = canonical_id, score
+            return best
+        
+        # TODO: Add property matching, etc.
         return None
     
     def create_canonical_entity(self, observation_ids: List[str], 
@@ -160,6 +267,9 @@ class ProvenanceTracker:
         if not observation_ids:
             raise ValueError("Need at least one observation to create canonical entity")
         
+        # One timestamp for the whole resolution step
+        now_iso = datetime.now(tz=timezone.utc).isoformat()
+        
         # Check if any observation already has a canonical entity
         existing_canonical = None
         for obs_id in observation_ids:
@@ -174,7 +284,7 @@ class ProvenanceTracker:
             canonical_id = existing_canonical
         else:
             # Create new canonical entity
-            canonical_id = f"entity:{uuid.uuid4().hex[:12]}"
+            canonical_id = f"entity:{self._id_prefix}{next(self._ent_counter):08x}"
             first_obs = self.observations[observation_ids[0]]
             
             canonical = CanonicalEntity(
@@ -185,20 +295,20 @@ class ProvenanceTracker:
                 merged_properties={},
                 observations=[],
                 resolutions=[],
-                created_at=datetime.now(tz=timezone.utc).isoformat(),
-                last_updated=datetime.now(tz=timezone.utc).isoformat()
+                created_at=now_iso,
+                last_updated=now_iso
             )
             self.canonical[canonical_id] = canonical
         
         # Create resolution record
-        resolution_id = f"res:{uuid.uuid4().hex[:12]}"
+        resolution_id = f"res:{self._id_prefix}{next(self._res_counter):08x}"
         resolution = EntityResolution(
             resolution_id=resolution_id,
             canonical_id=canonical_id,
             observation_ids=observation_ids,
             resolution_method=resolution_method,
-            resolution_confidence=0.95 if resolution_method == "exact_match" else 0.8,
-            resolution_timestamp=datetime.now(tz=timezone.utc).isoformat(),
+            resolution_confidence_q=95 if resolution_method == "exact_match" else 80,
+            resolution_timestamp=now_iso,
             resolution_evidence={
                 "method": resolution_method,
                 "matched_on": "name" if resolution_method == "exact_match" else "similarity"
@@ -211,13 +321,18 @@ class ProvenanceTracker:
             obs = self.observations[obs_id]
             canonical.observations.append(obs)
             canonical.all_names.add(obs.name)
+            canonical.source_documents.add(obs.source_document)
+            # A name shared by two canonicals resolves to whichever claimed it first
+            self.alias_index.setdefault((canonical.entity_type, obs.normalized_name), canonical_id)
+            self._index_alias(canonical_id, obs.normalized_name)
             
             # Merge properties
             for key, value in obs.properties.items():
                 if key not in canonical.merged_properties:
                     canonical.merged_properties[key] = value
                 elif isinstance(value, list) and isinstance(canonical.merged_properties[key], list):
-                    canonical.merged_properties[key] = list(set(canonical.merged_properties[key] + value))
+                    # Order-preserving dedupe; a new list, since the first value is shared with its observation
+                    canonical.merged_properties[key] = list(dict.fromkeys(canonical.merged_properties[key] + value))
             
             # Update index
             if canonical_id not in self.canonical_to_observations:
@@ -225,7 +340,7 @@ class ProvenanceTracker:
             self.canonical_to_observations[canonical_id].append(obs_id)
         
         canonical.resolutions.append(resolution)
-        canonical.last_updated = datetime.now(tz=timezone.utc).isoformat()
+        canonical.last_updated = now_iso
         
         # Record resolution transformation (CAT)
         self.record_transformation({
@@ -245,9 +360,28 @@ class ProvenanceTracker:
     def record_transformation(self, transformation: Dict):
         """Record a Content-Addressable Transformation"""
         # Add CID for the transformation itself
-        transformation['cid'] = self.generate_cid(json.dumps(transformation, sort_keys=True))
+        transformation['cid'] = self.transformation_cid(transformation)
+        
+        # Index by the ids on either side so provenance lookups skip the full log
+        index = len(self.transformations)
+        for state, by_id in (('fromState', self.trans_from_state), ('toState', self.trans_to_state)):
+            for state_id in self._state_ids(transformation, state):
+                by_id.setdefault(state_id, []).append(index)
         self.transformations.append(transformation)
     
+    @staticmethod
+    def _state_ids(transformation: Dict, state: str) -> List[str]:
+        """Ids in a fromState/toState, which holds either one id or a list"""
+        ids = transformation.get(state, [])
+        return [ids] if isinstance(ids, str) else ids
+    
+    def transformations_for(self, canonical_id: str) -> List[Dict]:
+        """Transformations into a canonical entity or out of any of its observations, in log order"""
+        indices = set(self.trans_to_state.get(canonical_id, []))
+        for obs_id in self.canonical_to_observations.get(canonical_id, []):
+            indices.update(self.trans_from_state.get(obs_id, []))
+        return [self.transformations[i] for i in sorted(indices)]
+    
     def get_entity_provenance(self, canonical_id: str) -> Dict:
         """
         Get complete provenance for a canonical entity
@@ -256,8 +390,12 @@ class ProvenanceTracker:
         if canonical_id not in self.canonical:
             return None
         
-        canonical = self.canonical[canonical_id]
-        
+        return self._build_provenance(canonical_id, self.canonical[canonical_id],
+                                      self.transformations_for(canonical_id))
+    
+    def _build_provenance(self, canonical_id: str, canonical: CanonicalEntity,
+                          transformations: List[Dict]) -> Dict:
+        """Provenance document for one canonical entity given its transformations"""
         provenance = {
             "@context": {
                 "regen": "https://regen.network/ontology#",
@@ -295,15 +433,10 @@ class ProvenanceTracker:
                 }
                 for res in canonical.resolutions
             ],
-            "transformations": [
-                t for t in self.transformations 
-                if canonical_id in str(t.get('toState', ''))
-                or any(obs_id in str(t.get('fromState', '')) 
-                      for obs_id in self.canonical_to_observations.get(canonical_id, []))
-            ],
+            "transformations": transformations,
             "statistics": {
                 "total_observations": len(canonical.observations),
-                "unique_sources": len(set(obs.source_document for obs in canonical.observations)),
+                "unique_sources": len(canonical.source_documents),
                 "name_variations": len(canonical.all_names),
                 "created_at": canonical.created_at,
                 "last_updated": canonical.last_updated
@@ -316,6 +449,35 @@ class ProvenanceTracker:
         """
         Export complete provenance graph with all entities and transformations
         """
+        # Bucket the transformation log by canonical entity in one sweep
+        obs_to_canonical = {}
+        for canonical_id, obs_ids in self.canonical_to_observations.items():
+            for obs_id in obs_ids:
+                obs_to_canonical.setdefault(obs_id, []).append(canonical_id)
+        
+        trans_by_canonical = {canonical_id: [] for canonical_id in self.canonical}
+        for t in self.transformations:
+            owners = {i for i in self._state_ids(t, 'toState') if i in trans_by_canonical}
+            for obs_id in self._state_ids(t, 'fromState'):
+                owners.update(obs_to_canonical.get(obs_id, []))
+            for canonical_id in owners:
+                trans_by_canonical[canonical_id].append(t)
+        
+        canonical_entities = []
+        provenance_links = {}
+        for canonical_id, entity in self.canonical.items():
+            canonical_entities.append({
+                "@id": canonical_id,
+                "primary_name": entity.primary_name,
+                "type": entity.entity_type,
+                "aliases": list(entity.all_names),
+                "properties": entity.merged_properties,
+                "observation_count": len(entity.observations),
+                "source_count": len(entity.source_documents)
+            })
+            provenance_links[canonical_id] = self._build_provenance(
+                canonical_id, entity, trans_by_canonical[canonical_id])
+        
         return {
             "@context": {
                 "regen": "https://regen.network/ontology#",
@@ -329,26 +491,11 @@ class ProvenanceTracker:
                 "total_canonical_entities": len(self.canonical),
                 "total_transformations": len(self.transformations)
             },
-            "canonical_entities": [
-                {
-                    "@id": canonical_id,
-                    "primary_name": entity.primary_name,
-                    "type": entity.entity_type,
-                    "aliases": list(entity.all_names),
-                    "properties": entity.merged_properties,
-                    "observation_count": len(entity.observations),
-                    "source_count": len(set(obs.source_document for obs in entity.observations))
-                }
-                for canonical_id, entity in self.canonical.items()
-            ],
+            "canonical_entities": canonical_entities,
             "transformations": self.transformations,
-            "provenance_links": {
-                canonical_id: self.get_entity_provenance(canonical_id)
-                for canonical_id in self.canonical.keys()
-            }
+            "provenance_links": provenance_links
         }
 
-
 # Example usage
 if __name__ == "__main__":
     tracker = ProvenanceTracker()
@@ -385,12 +532,12 @@ if __name__ == "__main__":
     all_observations = []
     for doc in docs:
         print(f"Processing: {doc['path']}")
-        for entity in doc['entities']:
+        for idx, entity in enumerate(doc['entities']):
             obs_id = tracker.record_observation(
                 entity, 
                 doc['path'], 
                 doc['cid'],
-                {"file": doc['path'], "index": doc['entities'].index(entity)}
+                {"file": doc['path'], "index": idx}
             )
             all_observations.append((obs_id, entity['name']))
             print(f"  Recorded: {entity['name']} -> {obs_id}")
@@ -429,8 +576,12 @@ if __name__ == "__main__":
     # Export complete provenance graph
     graph = tracker.export_provenance_graph()
     
-    with open('provenance-graph.json', 'w') as f:
-        json.dump(graph, f, indent=2)
+    if orjson is not None:
+        with open('provenance-graph.json', 'wb') as f:
+            f.write(orjson.dumps(graph, option=orjson.OPT_INDENT_2))
+    else:
+        with open('provenance-graph.json', 'w') as f:
+            json.dump(graph, f, indent=2)
     
     print(f"\n✅ Complete provenance graph saved to provenance-graph.json")
     print(f"   Total canonical entities: {graph['metadata']['total_canonical_entities']}")
@@ -1,12 +1,28 @@
 #!/usr/bin/env python3
 """
 Simple KOI API Server - Connects React frontend to Fuseki backend
+
+The built-in server is for local development. Handlers spend most of their time
+waiting on Fuseki, so in production run them under cooperative workers:
+    gunicorn -k gevent -w $(nproc) -b 0.0.0.0:8001 koi_api_server:app
 """
 
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as URLLib3Error
 import json
+import threading
+import time
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# What reading a streamed Fuseki response can raise mid-iteration
+STREAM_ERRORS = (requests.RequestException, URLLib3Error) + ((ijson.JSONError,) if ijson else ())
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
@@ -14,21 +30,70 @@ CORS(app)  # Enable CORS for React frontend
 # Fuseki configuration
 FUSEKI_ENDPOINT = "http://localhost:3030/koi/sparql"
 
-def execute_sparql(query):
-    """Execute SPARQL query against Fuseki"""
+# One keep-alive session for all Fuseki calls instead of a new connection per request
+SESSION = requests.Session()
+SESSION.headers.update({"Accept": "application/json"})
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+
+# Short-lived cache for the read-only GET endpoints; raw POST queries always hit Fuseki
+CACHE_TTL = 30  # seconds
+CACHE_MAX_ENTRIES = 256
+_cache = {}  # key -> (expires_at, value)
+_cache_lock = threading.Lock()
+
+def cache_get(key):
+    """Cached value for key, or None if missing or expired"""
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+def cache_put(key, value):
+    """Store value for CACHE_TTL seconds, evicting the oldest entry when full"""
+    with _cache_lock:
+        _cache.pop(key, None)
+        if len(_cache) >= CACHE_MAX_ENTRIES:
+            del _cache[next(iter(_cache))]
+        _cache[key] = (time.monotonic() + CACHE_TTL, value)
+
+def execute_sparql(query, streaming=False):
+    """Execute SPARQL query against Fuseki
+    
+    With streaming=True and ijson installed, results.bindings is a lazy iterator
+    parsed straight off the response instead of a fully loaded list.
+    """
+    streaming = streaming and ijson is not None
     try:
-        response = requests.post(
-            FUSEKI_ENDPOINT,
-            data={"query": query},
-            headers={"Accept": "application/json"}
-        )
+        response = SESSION.post(FUSEKI_ENDPOINT, data={"query": query}, timeout=30, stream=streaming)
         if response.status_code == 200:
+            if streaming:
+                return {"results": {"bindings": _stream_bindings(response)}}
             return response.json()
         else:
+            response.close()
             return {"error": f"Fuseki error: {response.status_code}"}
     except Exception as e:
         return {"error": str(e)}
 
+def _stream_bindings(response):
+    """Yield result bindings one at a time, releasing the connection when done"""
+    try:
+        response.raw.decode_content = True
+        yield from ijson.items(response.raw, "results.bindings.item")
+    finally:
+        response.close()
+
+def execute_sparql_cached(query):
+    """execute_sparql for idempotent reads; errors are not cached"""
+    key = ("sparql", query)
+    result = cache_get(key)
+    if result is None:
+        result = execute_sparql(query)
+        if "error" not in result:
+            cache_put(key, result)
+    return result
+
 @app.route('/api/koi/health/', methods=['GET'])
 def health():
     """Health check endpoint"""
@@ -56,6 +121,12 @@ def graph_data():
     max_nodes = request.args.get('max_nodes', 1000, type=int)
     show_metadata = request.args.get('show_metadata', 'false').lower() == 'true'
     
+    # The response depends only on these two parameters
+    cache_key = ("graph-data", max_nodes, show_metadata)
+    payload = cache_get(cache_key)
+    if payload is not None:
+        return jsonify(payload)
+    
     # Build filter for metadata nodes
     metadata_filter = ""
     if not show_metadata:
@@ -69,32 +140,42 @@ def graph_data():
         )
         """
     
-    # Get diverse sample of entities with relationships
+    # Get diverse sample of entities with relationships. The triples are limited
+    # first and then grouped, so a node with several types or labels still yields
+    # one row per triple and LIMIT counts triples rather than OPTIONAL combinations.
     query = f"""
     PREFIX regen: <http://regen.network/ontology#>
     PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
     PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
     
-    SELECT ?subject ?predicate ?object ?subjectType ?objectType ?subjectLabel ?objectLabel
+    SELECT ?subject ?predicate ?object
+           (SAMPLE(?sType) AS ?subjectType) (SAMPLE(?oType) AS ?objectType)
+           (SAMPLE(?sLabel) AS ?subjectLabel) (SAMPLE(?oLabel) AS ?objectLabel)
     WHERE {{
-        ?subject ?predicate ?object .
-        OPTIONAL {{ ?subject rdf:type ?subjectType }}
-        OPTIONAL {{ ?object rdf:type ?objectType }}
-        OPTIONAL {{ ?subject rdfs:label ?subjectLabel }}
-        OPTIONAL {{ ?object rdfs:label ?objectLabel }}
-        
-        # Focus on meaningful relationships, include orn: URIs
-        FILTER(?predicate != rdf:type && 
-               ?predicate != rdfs:label &&
-               (STRSTARTS(STR(?subject), "orn:") || 
-                STRSTARTS(STR(?subject), "http://regen.network/")))
-        
-        {metadata_filter}
+        {{
+            SELECT ?subject ?predicate ?object
+            WHERE {{
+                ?subject ?predicate ?object .
+                
+                # Focus on meaningful relationships, include orn: URIs
+                FILTER(?predicate != rdf:type && 
+                       ?predicate != rdfs:label &&
+                       (STRSTARTS(STR(?subject), "orn:") || 
+                        STRSTARTS(STR(?subject), "http://regen.network/")))
+                
+                {metadata_filter}
+            }}
+            LIMIT {max_nodes}
+        }}
+        OPTIONAL {{ ?subject rdf:type ?sType }}
+        OPTIONAL {{ ?object rdf:type ?oType }}
+        OPTIONAL {{ ?subject rdfs:label ?sLabel }}
+        OPTIONAL {{ ?object rdfs:label ?oLabel }}
     }}
-    LIMIT {max_nodes}
+    GROUP BY ?subject ?predicate ?object
     """
     
-    result = execute_sparql(query)
+    result = execute_sparql(query, streaming=True)
     
     if "error" in result:
         return jsonify({"error": result["error"]}), 500
@@ -117,50 +198,68 @@ def graph_data():
         'Location': '#8BC34A'          # Light Green
     }
     
-    for binding in result.get("results", {}).get("bindings", []):
-        # Add subject node
-        subject_uri = binding["subject"]["value"]
-        subject_id = subject_uri.split("/")[-1]
-        
-        if subject_id not in nodes:
-            subject_type = binding.get("subjectType", {}).get("value", "").split("#")[-1]
-            subject_label = binding.get("subjectLabel", {}).get("value", subject_id)
-            
-            nodes[subject_id] = {
-                "id": subject_id,
-                "label": subject_label[:30] + "..." if len(subject_label) > 30 else subject_label,
-                "type": subject_type or "Unknown",
-                "color": color_map.get(subject_type, "#9E9E9E"),
-                "size": 10
-            }
-        
-        # Add object node if it's a URI
-        if binding["object"]["type"] == "uri":
-            object_uri = binding["object"]["value"]
-            object_id = object_uri.split("/")[-1]
+    # Subjects, objects and predicates recur across rows, so shorten each URI once
+    node_ids = {}    # URI -> last path segment
+    predicates = {}  # predicate URI -> local name
+    color_map_get = color_map.get
+    
+    # A streamed response is only parsed here, so a truncated or malformed body
+    # surfaces during iteration rather than in execute_sparql
+    try:
+        for binding in result.get("results", {}).get("bindings", []):
+            # Add subject node
+            subject_uri = binding["subject"]["value"]
+            subject_id = node_ids.get(subject_uri)
+            if subject_id is None:
+                subject_id = node_ids[subject_uri] = subject_uri.rsplit("/", 1)[-1]
             
-            if object_id not in nodes:
-                object_type = binding.get("objectType", {}).get("value", "").split("#")[-1]
-                object_label = binding.get("objectLabel", {}).get("value", object_id)
+            if subject_id not in nodes:
+                subject_type = binding.get("subjectType", {}).get("value", "").rsplit("#", 1)[-1]
+                subject_label = binding.get("subjectLabel", {}).get("value", subject_id)
                 
-                nodes[object_id] = {
-                    "id": object_id,
-                    "label": object_label[:30] + "..." if len(object_label) > 30 else object_label,
-                    "type": object_type or "Unknown",
-                    "color": color_map.get(object_type, "#9E9E9E"),
+                nodes[subject_id] = {
+                    "id": subject_id,
+                    "label": subject_label[:30] + "..." if len(subject_label) > 30 else subject_label,
+                    "type": subject_type or "Unknown",
+                    "color": color_map_get(subject_type, "#9E9E9E"),
                     "size": 10
                 }
             
-            # Add edge
-            predicate = binding["predicate"]["value"].split("#")[-1].split("/")[-1]
-            edges.append({
-                "source": subject_id,
-                "target": object_id,
-                "label": predicate,
-                "id": f"{subject_id}-{predicate}-{object_id}"
-            })
-    
-    return jsonify({
+            # Add object node if it's a URI
+            if binding["object"]["type"] == "uri":
+                object_uri = binding["object"]["value"]
+                object_id = node_ids.get(object_uri)
+                if object_id is None:
+                    object_id = node_ids[object_uri] = object_uri.rsplit("/", 1)[-1]
+                
+                if object_id not in nodes:
+                    object_type = binding.get("objectType", {}).get("value", "").rsplit("#", 1)[-1]
+                    object_label = binding.get("objectLabel", {}).get("value", object_id)
+                    
+                    nodes[object_id] = {
+                        "id": object_id,
+                        "label": object_label[:30] + "..." if len(object_label) > 30 else object_label,
+                        "type": object_type or "Unknown",
+                        "color": color_map_get(object_type, "#9E9E9E"),
+                        "size": 10
+                    }
+                
+                # Add edge
+                predicate_uri = binding["predicate"]["value"]
+                predicate = predicates.get(predicate_uri)
+                if predicate is None:
+                    predicate = predicates[predicate_uri] = predicate_uri.rsplit("#", 1)[-1].rsplit("/", 1)[-1]
+                edges.append({
+                    "source": subject_id,
+                    "target": object_id,
+                    "label": predicate,
+                    "id": f"{subject_id}-{predicate}-{object_id}"
+                })
+        
+    except STREAM_ERRORS as e:
+        return jsonify({"error": str(e)}), 500
+    
+    payload = {
         "nodes": list(nodes.values()),
         "edges": edges,
         "stats": {
@@ -168,7 +267,9 @@ def graph_data():
             "edge_count": len(edges),
             "total_triples": 3851
         }
-    })
+    }
+    cache_put(cache_key, payload)
+    return jsonify(payload)
 
 @app.route('/api/koi/sparql/', methods=['POST'])
 def sparql_query():
@@ -203,7 +304,7 @@ def essence_data():
     LIMIT 100
     """
     
-    result = execute_sparql(query)
+    result = execute_sparql_cached(query)
     
     if "error" in result:
         # Return mock data if no essence data found
@@ -235,6 +336,7 @@ if __name__ == '__main__':
     print("  - GET  /api/koi/graph-data/")
     print("  - POST /api/koi/sparql/")
     print("  - GET  /api/koi/essence-data/")
+    print("For production: gunicorn -k gevent -w $(nproc) -b 0.0.0.0:8001 koi_api_server:app")
     print("=" * 50)
     
-    app.run(host='0.0.0.0', port=8001, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=8001, threaded=True)
\ No newline at end of file
@@ -4,82 +4,204 @@ Load TTL data into Apache Jena Fuseki triplestore
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import shutil
+import subprocess
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from rdflib import Graph, URIRef
+from rdflib import Graph
 
-def load_ttl_to_fuseki(ttl_file, dataset_name="koi", fuseki_url="http://localhost:3030"):
+def fuseki_session():
     """
-    Load TTL file into Fuseki using SPARQL Update
+    Keep-alive session for Fuseki, so the clear, every insert chunk and the
+    verification queries share one connection instead of reconnecting per POST
     """
-    # Read the TTL file
+    session = requests.Session()
+    session.auth = ('admin', 'admin')
+    retry = Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504], allowed_methods=None)
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+    return session
+
+NTRIPLES_SUFFIXES = ('.nt', '.ntriples')
+
+def ntriples_lines(ttl_path):
+    """
+    Yield the file's statements as N-Triples lines without holding a parsed graph:
+    N-Triples files are read as-is, Turtle goes through Raptor's `rapper` when it
+    is installed, and only otherwise through rdflib
+    """
+    if ttl_path.suffix in NTRIPLES_SUFFIXES:
+        with open(ttl_path, 'rb') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith(b'#'):
+                    yield line
+        return
+    
+    rapper = shutil.which('rapper')
+    if rapper:
+        with subprocess.Popen([rapper, '-q', '-i', 'turtle', '-o', 'ntriples', str(ttl_path)],
+                              stdout=subprocess.PIPE) as proc:
+            for line in proc.stdout:
+                line = line.strip()
+                if line:
+                    yield line
+        if proc.returncode:
+            raise RuntimeError(f"rapper exited with status {proc.returncode}")
+        return
+    
+    g = Graph()
+    g.parse(ttl_path, format="turtle")
+    for line in g.serialize(format="nt", encoding="utf-8").splitlines():
+        if line:
+            yield line
+
+def insert_chunks(triples, chunk_size, max_bytes):
+    """Group N-Triples lines into chunks of at most chunk_size lines and about max_bytes"""
+    chunk = []
+    chunk_bytes = 0
+    for line in triples:
+        if chunk and (len(chunk) >= chunk_size or chunk_bytes + len(line) + 1 > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(line)
+        chunk_bytes += len(line) + 1
+    if chunk:
+        yield chunk
+
+def post_insert(session, update_url, chunk):
+    """
+    POST one INSERT DATA chunk, splitting it in half while Fuseki rejects it as
+    too large (or to narrow down a bad triple). Returns the failing status, or None.
+    """
+    # One join builds the whole body: no intermediate triples string to copy twice
+    insert_query = b" ".join([b"INSERT DATA {", *chunk, b"}"])
+    response = session.post(update_url, data=insert_query,
+                            headers={'Content-Type': 'application/sparql-update'})
+    
+    if response.status_code in [400, 413] and len(chunk) > 1:
+        half = len(chunk) // 2
+        return (post_insert(session, update_url, chunk[:half])
+                or post_insert(session, update_url, chunk[half:]))
+    
+    if response.status_code not in [200, 201, 204]:
+        return response.status_code
+    return None
+
+# Graph Store responses that mean "try SPARQL Update instead" rather than bad data
+GSP_REFUSED = (404, 405, 413, 415)
+
+def upload_with_gsp(session, data_url, ttl_path):
+    """
+    POST the Turtle file as-is to the Graph Store Protocol endpoint; Fuseki parses
+    it natively and streams it into the store, with no SPARQL layer in between.
+    Returns True, False, or None when the server refuses the request outright
+    (no GSP endpoint, body too large) and the caller should fall back.
+    """
+    content_type = 'application/n-triples' if ttl_path.suffix in NTRIPLES_SUFFIXES else 'text/turtle'
+    with open(ttl_path, 'rb') as f:
+        response = session.post(data_url, data=f, headers={'Content-Type': content_type})
+    
+    if response.status_code in GSP_REFUSED:
+        print(f"  ⚠️ Graph Store upload refused ({response.status_code})")
+        return None
+    
+    if response.status_code not in [200, 201, 204]:
+        print(f"❌ Upload failed: {response.status_code}")
+        return False
+    
+    try:
+        loaded = response.json().get('tripleCount')
+    except ValueError:
+        loaded = None
+    if loaded is None:
+        print("✅ Successfully loaded data to Fuseki")
+    else:
+        print(f"✅ Successfully loaded {loaded} triples to Fuseki")
+    return True
+
+def upload_with_update(session, update_url, ttl_path, chunk_size, max_bytes, max_in_flight):
+    """Stream the file as N-Triples into chunked INSERT DATA updates and post them"""
+    # Upload in large chunks, keeping a bounded window of POSTs in flight
+    uploaded = 0
+    
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        in_flight = deque()
+        chunks = insert_chunks(ntriples_lines(ttl_path), chunk_size, max_bytes)
+        
+        while True:
+            # Fill the window, then wait on the oldest request
+            for chunk in chunks:
+                in_flight.append((len(chunk), pool.submit(post_insert, session, update_url, chunk)))
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+            
+            count, future = in_flight.popleft()
+            status = future.result()
+            if status is not None:
+                for _, pending in in_flight:
+                    pending.cancel()
+                print(f"❌ Failed chunk at triple {uploaded + 1}: {status}")
+                return False
+            
+            uploaded += count
+            print(f"  Uploaded {uploaded} triples...")
+    
+    print(f"✅ Successfully loaded {uploaded} triples to Fuseki")
+    return True
+
+def load_ttl_to_fuseki(ttl_file, dataset_name="koi", fuseki_url="http://localhost:3030", session=None,
+                       use_gsp=True, chunk_size=5000, max_bytes=4 * 1024 * 1024, max_in_flight=4):
+    """
+    Load TTL file into Fuseki
+    
+    By default the file goes to the Graph Store Protocol endpoint in one request.
+    With use_gsp=False, or when that endpoint refuses the upload, it is sent as
+    SPARQL INSERT DATA updates instead: each carries
+    up to chunk_size triples and max_bytes of body, and up to max_in_flight of them
+    are posted concurrently so network round-trips overlap.
+    """
+    # Check the TTL file
     ttl_path = Path(ttl_file)
     if not ttl_path.exists():
         print(f"Error: File {ttl_file} not found")
         return False
     
-    with open(ttl_path, 'r') as f:
-        ttl_content = f.read()
-    
-    # Prepare the SPARQL Update endpoint
+    # Prepare the SPARQL Update and Graph Store endpoints
     update_url = f"{fuseki_url}/{dataset_name}/update"
+    data_url = f"{fuseki_url}/{dataset_name}/data?default"
     
     print(f"Uploading {ttl_path.name} to Fuseki dataset '{dataset_name}'...")
-    print(f"URL: {update_url}")
+    print(f"URL: {data_url if use_gsp else update_url}")
     
-    # Authentication
-    auth = ('admin', 'admin')
+    owns_session = session is None
+    if owns_session:
+        session = fuseki_session()
     
     try:
         # First, clear existing data (optional - comment out to append)
         print("Clearing existing data...")
         clear_query = "CLEAR DEFAULT"
-        clear_response = requests.post(update_url, 
-                                      data={'update': clear_query},
-                                      auth=auth)
+        clear_response = session.post(update_url, data={'update': clear_query})
         if clear_response.status_code in [200, 204]:
             print("Existing data cleared successfully")
         else:
             print(f"Warning: Could not clear data (status: {clear_response.status_code})")
         
-        # Convert TTL to INSERT DATA query
-        # Split into chunks if needed (Fuseki has query size limits)
         print("Uploading new data...")
-        
-        # Parse TTL and split into smaller chunks
-        from rdflib import Graph
-        g = Graph()
-        g.parse(data=ttl_content, format="turtle")
-        
-        # Convert to N-Triples for easier chunking
-        triples = []
-        for s, p, o in g:
-            # Format triple for SPARQL
-            s_str = f"<{s}>" if isinstance(s, URIRef) else str(s.n3())
-            p_str = f"<{p}>" if isinstance(p, URIRef) else str(p.n3())
-            o_str = f"<{o}>" if isinstance(o, URIRef) else o.n3()
-            triples.append(f"{s_str} {p_str} {o_str} .")
-        
-        # Upload in chunks of 100 triples
-        chunk_size = 100
-        total_triples = len(triples)
-        
-        for i in range(0, total_triples, chunk_size):
-            chunk = triples[i:i+chunk_size]
-            insert_query = f"INSERT DATA {{ {' '.join(chunk)} }}"
-            
-            response = requests.post(update_url, 
-                                    data={'update': insert_query},
-                                    auth=auth)
-            
-            if response.status_code not in [200, 201, 204]:
-                print(f"❌ Failed chunk {i//chunk_size + 1}: {response.status_code}")
-                return False
-            
-            if (i + chunk_size) % 500 == 0 or (i + chunk_size) >= total_triples:
-                print(f"  Uploaded {min(i + chunk_size, total_triples)}/{total_triples} triples...")
-        
-        print(f"✅ Successfully loaded {total_triples} triples to Fuseki")
+        loaded = upload_with_gsp(session, data_url, ttl_path) if use_gsp else None
+        if loaded is None:
+            if use_gsp:
+                print("  Falling back to chunked SPARQL Update...")
+            loaded = upload_with_update(session, update_url, ttl_path, chunk_size, max_bytes, max_in_flight)
+        if not loaded:
+            return False
         
         # Query to count triples
         count_query = """
@@ -88,7 +210,7 @@ def load_ttl_to_fuseki(ttl_file, dataset_name="koi", fuseki_url="http://localhos
         """
         
         query_url = f"{fuseki_url}/{dataset_name}/sparql"
-        query_response = requests.post(query_url, 
+        query_response = session.post(query_url,
                                       data={'query': count_query},
                                       headers={'Accept': 'application/json'})
         
@@ -102,8 +224,11 @@ def load_ttl_to_fuseki(ttl_file, dataset_name="koi", fuseki_url="http://localhos
     except Exception as e:
         print(f"❌ Error loading data: {e}")
         return False
+    finally:
+        if owns_session:
+            session.close()
 
-def query_sample_data(dataset_name="koi", fuseki_url="http://localhost:3030"):
+def query_sample_data(dataset_name="koi", fuseki_url="http://localhost:3030", session=None):
     """
     Query sample data to verify loading
     """
@@ -126,8 +251,12 @@ def query_sample_data(dataset_name="koi", fuseki_url="http://localhost:3030"):
     
     query_url = f"{fuseki_url}/{dataset_name}/sparql"
     
+    owns_session = session is None
+    if owns_session:
+        session = fuseki_session()
+    
     try:
-        response = requests.post(query_url,
+        response = session.post(query_url,
                                 data={'query': type_query},
                                 headers={'Accept': 'application/json'})
         
@@ -150,6 +279,9 @@ def query_sample_data(dataset_name="koi", fuseki_url="http://localhost:3030"):
     except Exception as e:
         print(f"Error querying: {e}")
         return False
+    finally:
+        if owns_session:
+            session.close()
 
 def main():
     # Load the production dataset
@@ -159,13 +291,15 @@ def main():
     print("KOI Dataset Loading to Apache Jena Fuseki")
     print("=" * 50)
     
-    # Load the data
-    success = load_ttl_to_fuseki(production_file)
+    with fuseki_session() as session:
+        # Load the data
+        success = load_ttl_to_fuseki(production_file, session=session)
+        
+        if success:
+            # Query sample data to verify
+            query_sample_data(session=session)
     
     if success:
-        # Query sample data to verify
-        query_sample_data()
-        
         print("\n✅ Dataset successfully loaded!")
         print("You can now access the data via:")
         print("  - SPARQL endpoint: http://localhost:3030/koi/sparql")
@@ -144,6 +144,10 @@ class RIDType(ABCMeta):
         
 
 class RID(metaclass=RIDType):
+    # empty slots keep the base classes dict-free, so subclasses defining
+    # __slots__ for their components get compact instances
+    __slots__ = ()
+    
     scheme: str | None = None
     namespace: str | None = None
     
@@ -216,9 +220,11 @@ class RID(metaclass=RIDType):
 
 
 class ORN(RID):
+    __slots__ = ()
     scheme = ORN_SCHEME
     
 class URN(RID):
+    __slots__ = ()
     scheme = URN_SCHEME
     
 class DefaultType(RID):
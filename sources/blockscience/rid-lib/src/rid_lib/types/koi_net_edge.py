@@ -5,6 +5,7 @@ from .koi_net_node import KoiNetNode
 
 
 class KoiNetEdge(ORN):
+    __slots__ = ("id",)
     namespace = "koi-net.edge"
     
     def __init__(self, id):
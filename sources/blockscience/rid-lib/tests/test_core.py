@@ -47,4 +47,13 @@ def test_invalid_rid_string():
 def test_invalid_orn_rid_string():
     with pytest.raises(TypeError):
         rid_obj = RID.from_string("orn:test")
-    
\ No newline at end of file
+            
+def test_koi_net_edge_slots():
+    from rid_lib.types import KoiNetEdge
+    
+    rid_obj = RID.from_string("orn:koi-net.edge:abc123")
+    
+    assert isinstance(rid_obj, KoiNetEdge)
+    assert rid_obj.reference == "abc123"
+    assert rid_obj == KoiNetEdge("abc123")
+    assert not hasattr(rid_obj, "__dict__")